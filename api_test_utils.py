@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Shared setup for the standalone API test scripts at the repository root.
+"""
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import atexit
+import io
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import redirect_stdout
+
+# (connect, read) timeouts in seconds for every request; requests has no default timeout
+REQUEST_TIMEOUT = (3.05, 30)
+
+def batch_timeout(count):
+    """REQUEST_TIMEOUT for a batch webhook of count payloads, which the server
+    processes one at a time"""
+    connect_timeout, read_timeout = REQUEST_TIMEOUT
+    return (connect_timeout, read_timeout * count)
+
+# One session per thread so each thread reuses its own keep-alive connections
+# to the API; requests.Session is not documented as thread-safe.
+# Transient gateway/rate-limit statuses are retried with exponential backoff.
+# Retry's default allowed_methods exclude POST: a 502/504 on a webhook may come
+# after the order was placed, so webhooks are only retried when the connection
+# itself failed. The last response is returned rather than raised once retries
+# run out, so tests still report the status code.
+_thread_local = threading.local()
+
+def get_session():
+    """Return the calling thread's session, creating it on first use"""
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=(429, 502, 503, 504),
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        atexit.register(session.close)
+        _thread_local.session = session
+    return session
+
+# Webhook bodies are sent as compact JSON built by one reusable encoder
+COMPACT_JSON = json.JSONEncoder(separators=(",", ":")).encode
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Full pretty-printed JSON dumps are only printed with VERBOSE=1
+VERBOSE = os.environ.get("VERBOSE") == "1"
+
+# Seconds to wait before each resend of an order Hyperliquid throttled
+RATE_LIMIT_WAITS = (10, 20, 40)
+
+def hyperliquid_rate_limited(result):
+    """True if Hyperliquid throttled the order behind a webhook result. The
+    backend still answers 200 and relays the 429 in hyperliquid_response.error"""
+    hl_response = result.get('hyperliquid_response') or {}
+    return '429' in str(hl_response.get('error', ''))
+
+def wait_for(url, predicate, timeout=5.0, delay=0.2, max_delay=1.0, request_timeout=REQUEST_TIMEOUT):
+    """Poll a GET endpoint with backoff until predicate(json) holds; False if
+    timeout expires first. The wait between polls grows 1.5x up to max_delay"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            response = get_session().get(url, timeout=request_timeout)
+            if response.status_code == 200 and predicate(response.json()):
+                return True
+        except requests.RequestException:
+            pass
+        
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 1.5, max_delay)
+
+def wait_for_position(api_url, symbol, side, timeout=5.0, request_timeout=REQUEST_TIMEOUT):
+    """Poll {api_url}/positions/{symbol} until a position on side ('long' or
+    'short') shows up; False if timeout expires first"""
+    return wait_for(
+        f"{api_url}/positions/{symbol}",
+        lambda data: any(position.get('side') == side for position in data.get('positions', [])),
+        timeout=timeout,
+        request_timeout=request_timeout
+    )
+
+# Output of tests running concurrently is captured per thread and written by
+# the caller in a fixed order, so their reports don't interleave
+_output_buffer = threading.local()
+
+class _ThreadLocalStdout:
+    """sys.stdout stand-in that sends each thread's writes to its own buffer"""
+    def __init__(self, stream):
+        self._stream = stream
+    
+    def write(self, text):
+        buffer = getattr(_output_buffer, "buffer", None)
+        return (buffer if buffer is not None else self._stream).write(text)
+    
+    def flush(self):
+        self._stream.flush()
+    
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+def thread_local_stdout():
+    """Context manager that lets captured_output capture prints per thread;
+    threads not running under captured_output write through as usual"""
+    return redirect_stdout(_ThreadLocalStdout(sys.stdout))
+
+def captured_output(test_fn):
+    """Run test_fn with this thread's prints captured; returns (result, output).
+    Only captures inside thread_local_stdout()"""
+    _output_buffer.buffer = io.StringIO()
+    try:
+        return test_fn(), _output_buffer.buffer.getvalue()
+    finally:
+        del _output_buffer.buffer
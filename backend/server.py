@@ -14,6 +14,7 @@ from hyperliquid.info import Info
 from hyperliquid.exchange import Exchange
 from hyperliquid.utils import constants
 import json
+import re
 import asyncio
 import time
 from collections import defaultdict
@@ -119,6 +120,9 @@ class StrategyRule(BaseModel):
     created_at: str = Field(default_factory=lambda: get_brazil_time().isoformat())
     updated_at: str = Field(default_factory=lambda: get_brazil_time().isoformat())
 
+class StrategyUpdate(BaseModel):
+    enabled: bool
+
 class ServerStatus(BaseModel):
     status: str
     environment: str
@@ -853,67 +857,137 @@ async def handle_tradingview_webhook(request: Request):
             stats['failed_forwards'] += 1
             raise HTTPException(status_code=400, detail="Payload must be a JSON object")
         
-        # Extract strategy_id from payload
-        strategy_id = payload.get("strategy_id", "OTHERS")
-        
-        # Auto-register new strategies
-        strategy_manager.add_strategy(strategy_id)
-        
-        # Log successful webhook processing with strategy info
-        await log_message("INFO", "✅ WEBHOOK VALIDATION SUCCESS")
-        await log_message("INFO", f"Strategy ID: {strategy_id}")
-        await log_message("INFO", f"Final Payload: {payload}")
-        
-        # Log the incoming webhook with strategy_id
-        webhook_msg = WebhookMessage(payload=payload, strategy_id=strategy_id)
-        await db.webhooks.insert_one(webhook_msg.dict())
-        stats['total_webhooks'] += 1
-        
-        await log_message("INFO", f"✅ WEBHOOK STORED: {webhook_msg.id} [Strategy: {strategy_id}]")
-        
-        # Forward to Hyperliquid
-        try:
-            await log_message("INFO", "🚀 FORWARDING TO HYPERLIQUID")
-            hyperliquid_response = await forward_to_hyperliquid(webhook_msg.id, payload, strategy_id)
-            stats['successful_forwards'] += 1
+        return await process_webhook_payload(payload)
             
-            await log_message("INFO", "✅ HYPERLIQUID FORWARD SUCCESS")
-            await log_message("INFO", f"Hyperliquid Response: {hyperliquid_response}")
-            
-            return {
-                "status": "success",
-                "webhook_id": webhook_msg.id,
-                "message": "Webhook processed and forwarded to Hyperliquid",
-                "hyperliquid_response": hyperliquid_response
-            }
-            
-        except Exception as forward_error:
-            await log_message("ERROR", "❌ HYPERLIQUID FORWARD FAILED")
-            await log_message("ERROR", f"Forward Error: {str(forward_error)}")
-            await log_message("ERROR", f"Forward Error Type: {type(forward_error).__name__}")
-            await log_message("ERROR", f"Webhook ID: {webhook_msg.id}")
-            await log_message("ERROR", f"Payload: {payload}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        await log_message("ERROR", "❌ WEBHOOK HANDLER FATAL ERROR")
+        await log_message("ERROR", f"Fatal Error: {str(e)}")
+        await log_message("ERROR", f"Fatal Error Type: {type(e).__name__}")
+        stats['failed_forwards'] += 1
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Webhook processing failed: {str(e)}"
+        )
+
+@api_router.post("/webhook/tradingview/batch")
+async def handle_tradingview_webhook_batch(request: Request):
+    """Handle several TradingView webhook payloads in one request, processed in order"""
+    try:
+        try:
+            body = await request.json()
+        except Exception as json_error:
+            stats['failed_forwards'] += 1
+            raise HTTPException(status_code=400, detail=f"Invalid JSON format: {str(json_error)}")
+        
+        batch = body.get("batch") if isinstance(body, dict) else None
+        if not isinstance(batch, list):
             stats['failed_forwards'] += 1
+            raise HTTPException(status_code=400, detail='Payload must be a JSON object like {"batch": [...]}')
+        
+        await log_message("INFO", f"=== WEBHOOK BATCH RECEIVED: {len(batch)} payloads ===")
+        
+        # Process sequentially - payloads may target the same symbol and the
+        # position clearing logic expects webhooks one at a time. Each payload
+        # starts by clearing its symbol, so one that follows a filled market
+        # order on the same symbol first waits for that position to show up
+        responses = []
+        settling_sides = {}
+        for payload in batch:
+            if not isinstance(payload, dict):
+                await log_message("ERROR", f"❌ BATCH PAYLOAD VALIDATION FAILED: {payload}")
+                stats['failed_forwards'] += 1
+                responses.append({
+                    "status": "error",
+                    "message": "Payload must be a JSON object",
+                    "error": "Payload must be a JSON object"
+                })
+                continue
             
-            return {
-                "status": "error",
-                "webhook_id": webhook_msg.id,
-                "message": f"Webhook processing failed: {str(forward_error)}",
-                "error": str(forward_error)
-            }
+            symbol = str(payload.get("symbol", "")).upper()
+            side = settling_sides.pop(symbol, None)
+            if side and not await wait_for_position_settled(symbol, side):
+                await log_message("WARNING", f"⚠️ {symbol} {side} position not visible yet - processing next batch payload anyway")
+            
+            response = await process_webhook_payload(payload)
+            responses.append(response)
             
+            # Only a successful market order is expected to leave a position
+            hl_response = response.get("hyperliquid_response")
+            order_side = str(payload.get("side", "")).lower()
+            if (
+                isinstance(hl_response, dict) and hl_response.get("status") == "success"
+                and str(payload.get("entry", "market")).lower() == "market"
+                and order_side in ("buy", "sell")
+            ):
+                settling_sides[symbol] = "long" if order_side == "buy" else "short"
+        
+        return {"status": "success", "responses": responses}
+        
     except HTTPException:
         raise
     except Exception as e:
-        await log_message("ERROR", "❌ WEBHOOK HANDLER FATAL ERROR")
+        await log_message("ERROR", "❌ WEBHOOK BATCH HANDLER FATAL ERROR")
         await log_message("ERROR", f"Fatal Error: {str(e)}")
         await log_message("ERROR", f"Fatal Error Type: {type(e).__name__}")
         stats['failed_forwards'] += 1
         raise HTTPException(
             status_code=500, 
-            detail=f"Webhook processing failed: {str(e)}"
+            detail=f"Webhook batch processing failed: {str(e)}"
         )
 
+async def process_webhook_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Store a validated webhook payload and forward it to Hyperliquid"""
+    # Extract strategy_id from payload
+    strategy_id = payload.get("strategy_id", "OTHERS")
+    
+    # Auto-register new strategies
+    strategy_manager.add_strategy(strategy_id)
+    
+    # Log successful webhook processing with strategy info
+    await log_message("INFO", "✅ WEBHOOK VALIDATION SUCCESS")
+    await log_message("INFO", f"Strategy ID: {strategy_id}")
+    await log_message("INFO", f"Final Payload: {payload}")
+    
+    # Log the incoming webhook with strategy_id
+    webhook_msg = WebhookMessage(payload=payload, strategy_id=strategy_id)
+    await db.webhooks.insert_one(webhook_msg.dict())
+    stats['total_webhooks'] += 1
+    
+    await log_message("INFO", f"✅ WEBHOOK STORED: {webhook_msg.id} [Strategy: {strategy_id}]")
+    
+    # Forward to Hyperliquid
+    try:
+        await log_message("INFO", "🚀 FORWARDING TO HYPERLIQUID")
+        hyperliquid_response = await forward_to_hyperliquid(webhook_msg.id, payload, strategy_id)
+        stats['successful_forwards'] += 1
+        
+        await log_message("INFO", "✅ HYPERLIQUID FORWARD SUCCESS")
+        await log_message("INFO", f"Hyperliquid Response: {hyperliquid_response}")
+        
+        return {
+            "status": "success",
+            "webhook_id": webhook_msg.id,
+            "message": "Webhook processed and forwarded to Hyperliquid",
+            "hyperliquid_response": hyperliquid_response
+        }
+        
+    except Exception as forward_error:
+        await log_message("ERROR", "❌ HYPERLIQUID FORWARD FAILED")
+        await log_message("ERROR", f"Forward Error: {str(forward_error)}")
+        await log_message("ERROR", f"Forward Error Type: {type(forward_error).__name__}")
+        await log_message("ERROR", f"Webhook ID: {webhook_msg.id}")
+        await log_message("ERROR", f"Payload: {payload}")
+        stats['failed_forwards'] += 1
+        
+        return {
+            "status": "error",
+            "webhook_id": webhook_msg.id,
+            "message": f"Webhook processing failed: {str(forward_error)}",
+            "error": str(forward_error)
+        }
+
 async def get_asset_info(symbol: str):
     """Get asset metadata from Hyperliquid including szDecimals and pxDecimals"""
     try:
@@ -1052,8 +1126,26 @@ def check_order_response_for_errors(response: dict) -> tuple[bool, str]:
     # Default to success if status is "ok"
     return True, ""
 
-async def get_open_positions_internal(symbol: str):
-    """Internal helper function to get open positions for a specific symbol"""
+async def wait_for_position_settled(symbol: str, side: str, timeout: float = 10.0) -> bool:
+    """Poll the symbol's positions with backoff until one on side ('long' or
+    'short') is visible; False if timeout expires first"""
+    deadline = time.monotonic() + timeout
+    delay = 0.2
+    while True:
+        positions = await get_open_positions_internal(symbol, verbose=False)
+        if any((position['size'] > 0) == (side == "long") for position in positions):
+            return True
+        
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * 1.5, 1.0)
+
+async def get_open_positions_internal(symbol: str, verbose: bool = True):
+    """Internal helper function to get open positions for a specific symbol.
+    With verbose=False only warnings and errors are written to the logs, for
+    callers that poll"""
     try:
         info = hyperliquid_config.get_info_client()
         
@@ -1067,7 +1159,8 @@ async def get_open_positions_internal(symbol: str):
         user_state = info.user_state(wallet_address)
         
         if not user_state or 'assetPositions' not in user_state:
-            await log_message("INFO", f"No positions found for {symbol}")
+            if verbose:
+                await log_message("INFO", f"No positions found for {symbol}")
             return []
         
         # Find positions for the specific symbol
@@ -1080,7 +1173,8 @@ async def get_open_positions_internal(symbol: str):
                 if size != 0:  # Only include non-zero positions
                     # Debug logging to understand data types
                     entry_px = position_data.get('entryPx')
-                    await log_message("INFO", f"Debug: entry_px type: {type(entry_px)}, value: {entry_px}")
+                    if verbose:
+                        await log_message("INFO", f"Debug: entry_px type: {type(entry_px)}, value: {entry_px}")
                     
                     positions.append({
                         'symbol': symbol,
@@ -1090,9 +1184,10 @@ async def get_open_positions_internal(symbol: str):
                         'position_data': position_data
                     })
         
-        await log_message("INFO", f"Found {len(positions)} open positions for {symbol}")
-        for pos in positions:
-            await log_message("INFO", f"  Position: {pos['size']} {symbol} @ {pos['entry_px']}")
+        if verbose:
+            await log_message("INFO", f"Found {len(positions)} open positions for {symbol}")
+            for pos in positions:
+                await log_message("INFO", f"  Position: {pos['size']} {symbol} @ {pos['entry_px']}")
         
         return positions
         
@@ -2706,6 +2801,30 @@ async def get_open_orders():
         await log_message("ERROR", f"Failed to get open orders: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/positions/{symbol}")
+async def get_symbol_positions(symbol: str):
+    """Get current open positions for a symbol from Hyperliquid"""
+    try:
+        # Quiet lookup: test scripts poll this endpoint and must not flood db.logs
+        positions = await get_open_positions_internal(symbol, verbose=False)
+        
+        return {
+            "symbol": symbol,
+            "positions": [
+                {
+                    "size": position["size"],
+                    "side": "long" if position["size"] > 0 else "short",
+                    "entry_px": position["entry_px"],
+                    "unrealized_pnl": position["unrealized_pnl"]
+                }
+                for position in positions
+            ]
+        }
+        
+    except Exception as e:
+        await log_message("ERROR", f"Failed to get positions for {symbol}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/status")
 async def get_status():
     """Get server status and statistics"""
@@ -2788,8 +2907,10 @@ async def get_status():
         }
 
 @api_router.get("/logs")
-async def get_logs(limit: int = 100, level: Optional[str] = None):
-    """Get recent logs (max 1000)"""
+async def get_logs(limit: int = 100, level: Optional[str] = None, contains: Optional[str] = None, since: Optional[str] = None):
+    """Get recent logs (max 1000), optionally only those whose message contains
+    any of the comma-separated `contains` keywords (case-insensitive) and only
+    those newer than the `since` timestamp"""
     try:
         # Limit maximum to 1000 to prevent performance issues
         if limit > 1000:
@@ -2798,6 +2919,19 @@ async def get_logs(limit: int = 100, level: Optional[str] = None):
         query = {}
         if level:
             query["level"] = level
+        
+        if contains:
+            # Parse comma-separated keywords and match them in the database
+            keywords = [k.strip() for k in contains.split(',') if k.strip()]
+            if keywords:
+                query["message"] = {
+                    "$regex": "|".join(re.escape(k) for k in keywords),
+                    "$options": "i"
+                }
+        
+        if since:
+            # Timestamps share one ISO format and offset, so they compare as strings
+            query["timestamp"] = {"$gt": since}
             
         logs = await db.logs.find(query).sort("timestamp", -1).limit(limit).to_list(limit)
         
@@ -2980,6 +3114,45 @@ async def get_hyperliquid_responses(limit: int = 50, strategy_ids: Optional[str]
         await log_message("ERROR", f"Failed to get responses: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Matches "type"/"order_type" market or limit indicators in serialized response data
+ORDER_TYPE_PATTERN = re.compile(r'"(?:order_)?type":\s*"(market|limit)"', re.IGNORECASE)
+
+@api_router.get("/responses/order-type-counts")
+async def get_response_order_type_counts(limit: int = 5, strategy_ids: Optional[str] = None):
+    """Count market vs limit orders among the most recent Hyperliquid responses"""
+    try:
+        # Build filter query based on strategy_ids
+        filter_query = {}
+        
+        if strategy_ids:
+            # Parse comma-separated strategy_ids
+            strategy_list = [s.strip() for s in strategy_ids.split(',') if s.strip()]
+            if strategy_list:
+                filter_query["strategy_id"] = {"$in": strategy_list}
+        
+        # Only response_data is needed for classification, so skip the rest of each document
+        responses = await db.hyperliquid_responses.find(
+            filter_query, {"response_data": 1, "_id": 0}
+        ).sort("_id", -1).limit(limit).to_list(limit)
+        
+        market_count = 0
+        limit_count = 0
+        for response in responses:
+            response_str = json.dumps(response.get("response_data", {}), default=str)
+            order_types = {order_type.lower() for order_type in ORDER_TYPE_PATTERN.findall(response_str)}
+            
+            # A response counts as market if it has any market indicator, otherwise limit
+            if "market" in order_types:
+                market_count += 1
+            elif "limit" in order_types:
+                limit_count += 1
+        
+        return {"checked": len(responses), "market": market_count, "limit": limit_count}
+        
+    except Exception as e:
+        await log_message("ERROR", f"Failed to count response order types: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.post("/environment")
 async def switch_environment(environment: str):
     """Switch between testnet and mainnet"""
@@ -3092,6 +3265,29 @@ async def toggle_strategy(strategy_id: str):
         await log_message("ERROR", f"Failed to toggle strategy {strategy_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.put("/strategies/{strategy_id}")
+async def update_strategy(strategy_id: str, update: StrategyUpdate):
+    """Set strategy enabled/disabled status (idempotent alternative to toggle)"""
+    try:
+        if strategy_id not in strategy_manager.strategies:
+            raise HTTPException(status_code=404, detail=f"Strategy {strategy_id} not found")
+        
+        strategy_manager.strategies[strategy_id]["enabled"] = update.enabled
+        
+        await log_message("INFO", f"⚙️ Strategy {strategy_id} {'enabled' if update.enabled else 'disabled'}")
+        
+        return {
+            "strategy_id": strategy_id,
+            "enabled": update.enabled,
+            "message": f"Strategy {strategy_id} {'enabled' if update.enabled else 'disabled'}"
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        await log_message("ERROR", f"Failed to update strategy {strategy_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/strategies/{strategy_id}")
 async def get_strategy(strategy_id: str):
     """Get specific strategy configuration"""
@@ -4,6 +4,9 @@ import json
 import time
 from datetime import datetime
 import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from api_test_utils import captured_output, thread_local_stdout
 
 # Base URL from frontend/.env
 BASE_URL = "https://strat-manager.preview.emergentagent.com/api"
@@ -28,6 +31,33 @@ SAMPLE_SELL_PAYLOAD = {
     "timestamp": "2025-07-09T16:00:00Z"
 }
 
+# Strategy segmentation payload templates - timestamp is added per request
+IMBA_HYPER_PAYLOAD = {
+    "symbol": "SOL",
+    "side": "buy",
+    "entry": "market",
+    "quantity": "0.5",
+    "price": "175.00",
+    "strategy_id": "IMBA_HYPER"
+}
+
+# No strategy_id - should default to OTHERS
+OTHERS_PAYLOAD = {
+    "symbol": "BTC",
+    "side": "sell",
+    "entry": "market",
+    "quantity": "0.01",
+    "price": "45000.00"
+}
+
+NEW_STRATEGY_PAYLOAD = {
+    "symbol": "ETH",
+    "side": "buy",
+    "entry": "limit",
+    "quantity": "0.1",
+    "price": "3200.00"
+}
+
 def test_enhanced_position_clearing_mechanism():
     """Test enhanced position clearing mechanism with detailed error logging - CRITICAL FOCUS"""
     print("\n=== Testing Enhanced Position Clearing Mechanism ===")
@@ -1146,15 +1176,7 @@ def test_strategy_filters_fixed():
     webhook_url = f"{BASE_URL}/webhook/tradingview"
     
     # Create IMBA_HYPER webhook
-    imba_webhook = {
-        "symbol": "SOL",
-        "side": "buy",
-        "entry": "market",
-        "quantity": "0.5",
-        "price": "175.00",
-        "strategy_id": "IMBA_HYPER",
-        "timestamp": datetime.now().isoformat()
-    }
+    imba_webhook = {**IMBA_HYPER_PAYLOAD, "timestamp": datetime.now().isoformat()}
     
     try:
         print("📤 Creating IMBA_HYPER webhook for testing...")
@@ -1170,15 +1192,7 @@ def test_strategy_filters_fixed():
         return False
     
     # Create OTHERS webhook for comparison
-    others_webhook = {
-        "symbol": "BTC",
-        "side": "sell",
-        "entry": "market",
-        "quantity": "0.01",
-        "price": "45000.00",
-        # No strategy_id - should default to OTHERS
-        "timestamp": datetime.now().isoformat()
-    }
+    others_webhook = {**OTHERS_PAYLOAD, "timestamp": datetime.now().isoformat()}
     
     try:
         print("📤 Creating OTHERS webhook for testing...")
@@ -1357,15 +1371,17 @@ def test_strategy_filters_fixed():
                 print(f"❌ Data leakage in combined filter: {leaked_count} invalid webhooks")
                 return False
             
-            # Verify both test webhooks are included
-            found_imba = False
-            found_others = False
+            # Verify both test webhooks are included - stop as soon as both are seen
+            wanted_ids = {imba_webhook_id, others_webhook_id}
+            seen_ids = set()
             for webhook in webhooks:
                 webhook_id = webhook.get('id')
-                if webhook_id == imba_webhook_id:
-                    found_imba = True
-                elif webhook_id == others_webhook_id:
-                    found_others = True
+                if webhook_id in wanted_ids:
+                    seen_ids.add(webhook_id)
+                    if seen_ids == wanted_ids:
+                        break
+            found_imba = imba_webhook_id in seen_ids
+            found_others = others_webhook_id in seen_ids
             
             if found_imba and found_others:
                 print("✅ Both test webhooks correctly included in combined filter")
@@ -1442,20 +1458,12 @@ def test_strategy_filters_fixed():
             print(f"✅ All webhooks endpoint returned {len(all_webhooks)} webhooks")
             
             # This should include both our test webhooks
-            found_imba = False
-            found_others = False
-            strategy_counts = {}
+            wanted_ids = {imba_webhook_id, others_webhook_id}
+            seen_ids = wanted_ids.intersection(webhook.get('id') for webhook in all_webhooks)
+            strategy_counts = Counter(webhook.get('strategy_id', 'None') for webhook in all_webhooks)
             
-            for webhook in all_webhooks:
-                webhook_id = webhook.get('id')
-                strategy_id = webhook.get('strategy_id', 'None')
-                
-                strategy_counts[strategy_id] = strategy_counts.get(strategy_id, 0) + 1
-                
-                if webhook_id == imba_webhook_id:
-                    found_imba = True
-                elif webhook_id == others_webhook_id:
-                    found_others = True
+            found_imba = imba_webhook_id in seen_ids
+            found_others = others_webhook_id in seen_ids
             
             print(f"📊 All Webhooks Strategy Distribution:")
             for strategy, count in strategy_counts.items():
@@ -1576,15 +1584,7 @@ def test_strategy_segmentation_system():
     # Test 2: Test webhook WITH strategy_id (IMBA_HYPER)
     print("\n--- Test 2: Webhook WITH strategy_id (IMBA_HYPER) ---")
     
-    webhook_with_strategy = {
-        "symbol": "SOL",
-        "side": "buy",
-        "entry": "market",
-        "quantity": "0.5",
-        "price": "175.00",
-        "strategy_id": "IMBA_HYPER",  # Explicit strategy_id
-        "timestamp": datetime.now().isoformat()
-    }
+    webhook_with_strategy = {**IMBA_HYPER_PAYLOAD, "timestamp": datetime.now().isoformat()}
     
     webhook_url = f"{BASE_URL}/webhook/tradingview"
     try:
@@ -1643,15 +1643,7 @@ def test_strategy_segmentation_system():
     # Test 3: Test webhook WITHOUT strategy_id (should default to OTHERS)
     print("\n--- Test 3: Webhook WITHOUT strategy_id (should default to OTHERS) ---")
     
-    webhook_without_strategy = {
-        "symbol": "BTC",
-        "side": "sell",
-        "entry": "market",
-        "quantity": "0.01",
-        "price": "45000.00",
-        # No strategy_id - should default to "OTHERS"
-        "timestamp": datetime.now().isoformat()
-    }
+    webhook_without_strategy = {**OTHERS_PAYLOAD, "timestamp": datetime.now().isoformat()}
     
     try:
         response = requests.post(webhook_url, json=webhook_without_strategy)
@@ -1706,11 +1698,7 @@ def test_strategy_segmentation_system():
     
     new_strategy_id = f"TEST_STRATEGY_{int(time.time())}"  # Unique strategy ID
     webhook_new_strategy = {
-        "symbol": "ETH",
-        "side": "buy",
-        "entry": "limit",
-        "quantity": "0.1",
-        "price": "3200.00",
+        **NEW_STRATEGY_PAYLOAD,
         "strategy_id": new_strategy_id,  # New strategy_id
         "timestamp": datetime.now().isoformat()
     }
@@ -1859,7 +1847,8 @@ def test_strategy_segmentation_system():
     
     try:
         # Test toggling IMBA_HYPER strategy
-        toggle_url = f"{BASE_URL}/strategies/IMBA_HYPER/toggle"
+        strategy_url = f"{BASE_URL}/strategies/IMBA_HYPER"
+        toggle_url = f"{strategy_url}/toggle"
         response = requests.post(toggle_url)
         
         if response.status_code == 200:
@@ -1869,13 +1858,16 @@ def test_strategy_segmentation_system():
             print(f"  New status: {'Enabled' if result.get('enabled') else 'Disabled'}")
             print(f"  Message: {result.get('message')}")
             
-            # Toggle back to original state
-            response2 = requests.post(toggle_url)
+            # The toggle response already reveals the original state
+            original_enabled = not result.get('enabled')
+            
+            # Restore original state with a single idempotent PUT
+            response2 = requests.put(strategy_url, json={"enabled": original_enabled})
             if response2.status_code == 200:
                 result2 = response2.json()
-                print(f"  ✅ Toggled back: {'Enabled' if result2.get('enabled') else 'Disabled'}")
+                print(f"  ✅ Restored: {'Enabled' if result2.get('enabled') else 'Disabled'}")
             else:
-                print(f"  ❌ Failed to toggle back: {response2.text}")
+                print(f"  ❌ Failed to restore original state: {response2.text}")
                 return False
         else:
             print(f"❌ Strategy toggle failed: {response.text}")
@@ -1889,13 +1881,63 @@ def test_strategy_segmentation_system():
     print("All strategy segmentation features are working correctly:")
     print("- ✅ Automatic segmentation by strategy_id")
     print("- ✅ Strategy rule center with different configurations")
-    print("- ✅ API endpoints (/api/strategies, /api/strategies/ids, /api/strategies/{id}/toggle)")
+    print("- ✅ API endpoints (/api/strategies, /api/strategies/ids, /api/strategies/{id}/toggle, PUT /api/strategies/{id})")
     print("- ✅ Automatic filter creation for new strategy_ids")
     print("- ✅ Strategy filtering in webhooks and responses endpoints")
     print("- ✅ Strategy-specific rule application")
     
     return True
 
+# (result name, test function, result names it must wait for)
+# State-mutating tests are chained in their original order; read-only tests
+# only wait for what they inspect and run concurrently with the chain.
+# Environment switching changes the target network, so it runs last.
+TEST_PLAN = [
+    ("Strategy Filters (FIXED)", test_strategy_filters_fixed, ()),
+    ("Strategy Segmentation System", test_strategy_segmentation_system, ("Strategy Filters (FIXED)",)),
+    ("Hyperliquid Connection", test_hyperliquid_connection, ()),
+    ("Status Endpoint", test_status_endpoint, ()),
+    ("Position Clearing Mechanism", test_position_clearing_mechanism, ("Strategy Segmentation System",)),
+    ("Clear Logs Functionality", test_clear_logs_functionality, ("Position Clearing Mechanism",)),
+    ("Logs Endpoint", test_logs_endpoint, ("Clear Logs Functionality",)),
+    ("Webhook Endpoint", lambda: test_webhook_endpoint()[0], ("Clear Logs Functionality",)),
+    ("Stop Loss Implementation", test_stop_loss_implementation, ("Webhook Endpoint",)),
+    ("Real Order Execution", test_real_order_execution, ("Stop Loss Implementation",)),
+    ("Webhooks Endpoint", test_webhooks_endpoint, ()),
+    ("Responses Endpoint", test_responses_endpoint, ()),
+    ("Environment Switching", test_environment_switching, (
+        "Strategy Filters (FIXED)", "Strategy Segmentation System", "Hyperliquid Connection",
+        "Status Endpoint", "Position Clearing Mechanism", "Clear Logs Functionality",
+        "Logs Endpoint", "Webhook Endpoint", "Stop Loss Implementation",
+        "Real Order Execution", "Webhooks Endpoint", "Responses Endpoint",
+    )),
+]
+
+def run_test_plan(plan):
+    """Run tests in dependency waves, executing each wave's tests concurrently"""
+    results = {}
+    pending = list(plan)
+    
+    # Each wave's output is captured per thread and printed in plan order once
+    # the wave is done, so concurrent reports never interleave
+    with ThreadPoolExecutor(max_workers=len(plan)) as executor, \
+            thread_local_stdout():
+        while pending:
+            ready = [entry for entry in pending if all(dep in results for dep in entry[2])]
+            if not ready:
+                raise RuntimeError(f"Unresolvable test dependencies: {[name for name, _, _ in pending]}")
+            
+            futures = {name: executor.submit(captured_output, test_fn) for name, test_fn, _ in ready}
+            for name, future in futures.items():
+                results[name], output = future.result()
+                sys.stdout.write(output)
+            sys.stdout.flush()
+            
+            pending = [entry for entry in pending if entry[0] not in futures]
+    
+    # Keep the summary in plan order
+    return {name: results[name] for name, _, _ in plan}
+
 def run_all_tests():
     """Run all tests and report results"""
     print("=" * 80)
@@ -1906,59 +1948,7 @@ def run_all_tests():
     print(f"Test started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("=" * 80)
     
-    # Track test results
-    results = {}
-    
-    # PRIORITY 1: Test strategy filters (USER'S MAIN COMPLAINT)
-    strategy_filters_success = test_strategy_filters_fixed()
-    results["Strategy Filters (FIXED)"] = strategy_filters_success
-    
-    # PRIORITY 2: Test strategy segmentation system (MAIN FOCUS OF REVIEW REQUEST)
-    strategy_segmentation_success = test_strategy_segmentation_system()
-    results["Strategy Segmentation System"] = strategy_segmentation_success
-    
-    # Test Hyperliquid connection first (key focus area)
-    hl_connection_success = test_hyperliquid_connection()
-    results["Hyperliquid Connection"] = hl_connection_success
-    
-    # Test status endpoint (key focus area)
-    status_success = test_status_endpoint()
-    results["Status Endpoint"] = status_success
-    
-    # Test position clearing mechanism
-    position_clearing_success = test_position_clearing_mechanism()
-    results["Position Clearing Mechanism"] = position_clearing_success
-    
-    # Test clear logs functionality
-    clear_logs_success = test_clear_logs_functionality()
-    results["Clear Logs Functionality"] = clear_logs_success
-    
-    # Test logs endpoint to ensure it works after clearing
-    logs_success = test_logs_endpoint()
-    results["Logs Endpoint"] = logs_success
-    
-    # Test webhook endpoint to generate logs and verify Brazilian timezone
-    webhook_success, webhook_id = test_webhook_endpoint()
-    results["Webhook Endpoint"] = webhook_success
-    
-    # Test stop loss implementation
-    stop_loss_success = test_stop_loss_implementation()
-    results["Stop Loss Implementation"] = stop_loss_success
-    
-    # Test real order execution
-    order_execution_success = test_real_order_execution()
-    results["Real Order Execution"] = order_execution_success
-    
-    # Test previously failing endpoints
-    webhooks_success = test_webhooks_endpoint()
-    results["Webhooks Endpoint"] = webhooks_success
-    
-    responses_success = test_responses_endpoint()
-    results["Responses Endpoint"] = responses_success
-    
-    # Test environment switching
-    env_success = test_environment_switching()
-    results["Environment Switching"] = env_success
+    results = run_test_plan(TEST_PLAN)
     
     # Print summary
     print("\n" + "=" * 80)
@@ -1,13 +1,116 @@
 #!/usr/bin/env python3
-import requests
 import json
-import time
 from datetime import datetime
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from api_test_utils import REQUEST_TIMEOUT, batch_timeout, captured_output, get_session, thread_local_stdout
 
 # Base URL from frontend/.env
 BASE_URL = "https://strat-manager.preview.emergentagent.com/api"
 
+# Formatted once at process start for the report banner
+_START_TS = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def iter_strings(obj):
+    """Yield every key and string value of a parsed JSON document"""
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            yield key
+            yield from iter_strings(value)
+    elif isinstance(obj, list):
+        for item in obj:
+            yield from iter_strings(item)
+    elif isinstance(obj, str):
+        yield obj
+
+def contains_text(obj, text):
+    """Check if any key or string value contains text, stopping at the first hit"""
+    return any(text in value for value in iter_strings(obj))
+
+# Test 1: Stop Loss with simple limit order
+STOP_LOSS_PAYLOAD = {
+    "symbol": "SOL",
+    "side": "buy",
+    "entry": "market",
+    "quantity": 0.2,
+    "stop": 170.0
+}
+
+# Test 2: Take Profit orders (TP1-TP4) with simple limit orders
+TP_PAYLOAD = {
+    "symbol": "SOL",
+    "side": "buy", 
+    "entry": "market",
+    "quantity": 0.2,
+    "tp1_price": 180.0,
+    "tp1_perc": 0.05,
+    "tp2_price": 185.0,
+    "tp2_perc": 0.05
+}
+
+# Test 3: Complete order flow with entry=market, stop, and multiple TPs
+COMPLETE_PAYLOAD = {
+    "symbol": "SOL",
+    "side": "buy", 
+    "entry": "market",
+    "quantity": 0.2,
+    "stop": 170.0,
+    "tp1_price": 180.0,
+    "tp1_perc": 0.05,
+    "tp2_price": 185.0,
+    "tp2_perc": 0.05
+}
+
+# Test 4: Test TP4 specifically (mentioned in error)
+TP4_PAYLOAD = {
+    "symbol": "SOL",
+    "side": "buy", 
+    "entry": "market",
+    "quantity": 0.2,
+    "tp4_price": 190.0,
+    "tp4_perc": 0.05
+}
+
+def hyperliquid_status(result):
+    """Return hyperliquid_response.status of a webhook result, or None if the shape is off"""
+    hl_response = result.get('hyperliquid_response')
+    if isinstance(hl_response, dict):
+        return hl_response.get('status')
+    return None
+
+def report_tp4_error(result):
+    """Report the user's exact TP4 'isMarket' error case, if present"""
+    if contains_text(result, "Error placing TP4 order"):
+        print("❌ CRITICAL: Specific TP4 'isMarket' error still present!")
+        print("🚨 The user's exact error case is not fixed")
+        return True
+    return False
+
+# (label, payload, optional check that reports a more specific 'isMarket' error)
+CASES = [
+    ("Stop Loss", STOP_LOSS_PAYLOAD, None),
+    ("Take Profit", TP_PAYLOAD, None),
+    ("Complete Flow", COMPLETE_PAYLOAD, None),
+    ("TP4", TP4_PAYLOAD, report_tp4_error)
+]
+
+def check_webhook_case(label, result, extra_check=None, may_contain_ismarket=True):
+    """Check one webhook case response for the 'isMarket' error and a successful order"""
+    # Check for 'isMarket' error specifically (skipped when the raw body already ruled it out)
+    if may_contain_ismarket and contains_text(result, "isMarket"):
+        if not (extra_check and extra_check(result)):
+            print(f"❌ CRITICAL: 'isMarket' error still present in {label} response!")
+            print("🚨 The simple limit order implementation did not fix the issue")
+        return False
+    print(f"✅ No 'isMarket' error detected in {label} response")
+    
+    # Check if the orders were processed successfully
+    if hyperliquid_status(result) == 'success':
+        print(f"✅ {label} processed successfully")
+        return True
+    print(f"❌ {label} failed: {result.get('hyperliquid_response')}")
+    return False
+
 def test_simple_limit_orders_tp_sl():
     """Test new simple limit order implementation for TP and SL - MAIN FOCUS OF REVIEW REQUEST"""
     print("\n=== Testing Simple Limit Orders for TP/SL Implementation ===")
@@ -15,224 +118,60 @@ def test_simple_limit_orders_tp_sl():
     print("User reported: 'As ordens ainda estão como Market' and error '❌ Error placing TP4 order: 'isMarket''")
     print("Main agent implemented simple limit orders using only: name, is_buy, sz, limit_px, reduce_only=True")
     
-    url = f"{BASE_URL}/webhook/tradingview"
-    
-    # Test 1: Stop Loss with simple limit order
-    print("\n--- Test 1: Stop Loss with Simple Limit Order ---")
-    stop_loss_payload = {
-        "symbol": "SOL",
-        "side": "buy",
-        "entry": "market",
-        "quantity": 0.2,
-        "stop": 170.0
-    }
+    url = f"{BASE_URL}/webhook/tradingview/batch"
     
+    # All four cases go out in one batch request; the server processes them in
+    # order and waits for each filled SOL position to show up before the next
+    print("\n--- Tests 1-4: Stop Loss, Take Profit, Complete Flow and TP4 (batched) ---")
     try:
-        response = requests.post(url, json=stop_loss_payload)
-        print(f"Stop Loss Status Code: {response.status_code}")
+        response = get_session().post(
+            url,
+            json={"batch": [payload for _, payload, _ in CASES]},
+            timeout=batch_timeout(len(CASES))
+        )
+        print(f"Batch Status Code: {response.status_code}")
         
-        if response.status_code == 200:
-            result = response.json()
-            print("✅ Stop Loss webhook received successfully")
-            print(f"Response: {json.dumps(result, indent=2)}")
-            
-            # Check for 'isMarket' error specifically
-            response_str = json.dumps(result)
-            if "'isMarket'" in response_str or "isMarket" in response_str:
-                print("❌ CRITICAL: 'isMarket' error still present in response!")
-                print("🚨 The simple limit order implementation did not fix the issue")
-                return False
-            else:
-                print("✅ No 'isMarket' error detected in response")
-            
-            # Check if order was processed successfully
-            hl_response = result.get('hyperliquid_response', {})
-            if hl_response.get('status') == 'success':
-                print("✅ Stop Loss order processed successfully")
-            else:
-                print(f"❌ Stop Loss order failed: {hl_response}")
-                return False
-        else:
-            print(f"❌ Stop Loss webhook failed: {response.text}")
+        if response.status_code != 200:
+            print(f"❌ Batch webhook failed: {response.text}")
             return False
-            
-    except Exception as e:
-        print(f"❌ Error testing Stop Loss: {str(e)}")
-        return False
-    
-    time.sleep(2)
-    
-    # Test 2: Take Profit orders (TP1-TP4) with simple limit orders
-    print("\n--- Test 2: Take Profit Orders (TP1-TP4) ---")
-    tp_payload = {
-        "symbol": "SOL",
-        "side": "buy", 
-        "entry": "market",
-        "quantity": 0.2,
-        "tp1_price": 180.0,
-        "tp1_perc": 0.05,
-        "tp2_price": 185.0,
-        "tp2_perc": 0.05
-    }
-    
-    try:
-        response = requests.post(url, json=tp_payload)
-        print(f"Take Profit Status Code: {response.status_code}")
         
-        if response.status_code == 200:
-            result = response.json()
-            print("✅ Take Profit webhook received successfully")
-            
-            # Check for 'isMarket' error specifically
-            response_str = json.dumps(result)
-            if "'isMarket'" in response_str or "isMarket" in response_str:
-                print("❌ CRITICAL: 'isMarket' error still present in TP response!")
-                print("🚨 The simple limit order implementation did not fix the TP issue")
-                return False
-            else:
-                print("✅ No 'isMarket' error detected in TP response")
-            
-            # Check if TP orders were processed successfully
-            hl_response = result.get('hyperliquid_response', {})
-            if hl_response.get('status') == 'success':
-                print("✅ Take Profit orders processed successfully")
-            else:
-                print(f"❌ Take Profit orders failed: {hl_response}")
-                return False
-        else:
-            print(f"❌ Take Profit webhook failed: {response.text}")
-            return False
-            
+        # One scan of the raw body rules out 'isMarket' for every case at once;
+        # the per-case walk only runs if it is present somewhere
+        ismarket_in_batch = b"isMarket" in response.content
+        case_results = response.json().get('responses', [])
     except Exception as e:
-        print(f"❌ Error testing Take Profit: {str(e)}")
+        print(f"❌ Error sending batch webhook: {str(e)}")
         return False
     
-    time.sleep(2)
-    
-    # Test 3: Complete order flow with entry=market, stop, and multiple TPs
-    print("\n--- Test 3: Complete Order Flow (Entry + Stop + Multiple TPs) ---")
-    complete_payload = {
-        "symbol": "SOL",
-        "side": "buy", 
-        "entry": "market",
-        "quantity": 0.2,
-        "stop": 170.0,
-        "tp1_price": 180.0,
-        "tp1_perc": 0.05,
-        "tp2_price": 185.0,
-        "tp2_perc": 0.05
-    }
-    
-    try:
-        response = requests.post(url, json=complete_payload)
-        print(f"Complete Flow Status Code: {response.status_code}")
-        
-        if response.status_code == 200:
-            result = response.json()
-            print("✅ Complete order flow webhook received successfully")
-            
-            # Check for 'isMarket' error specifically
-            response_str = json.dumps(result)
-            if "'isMarket'" in response_str or "isMarket" in response_str:
-                print("❌ CRITICAL: 'isMarket' error still present in complete flow!")
-                print("🚨 The simple limit order implementation did not fix all issues")
-                return False
-            else:
-                print("✅ No 'isMarket' error detected in complete flow")
-            
-            # Check if all orders were processed successfully
-            hl_response = result.get('hyperliquid_response', {})
-            if hl_response.get('status') == 'success':
-                print("✅ Complete order flow processed successfully")
-                print("✅ Entry order (market), Stop Loss, and Take Profit orders all processed")
-            else:
-                print(f"❌ Complete order flow failed: {hl_response}")
-                return False
-        else:
-            print(f"❌ Complete flow webhook failed: {response.text}")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Error testing complete flow: {str(e)}")
+    if len(case_results) != len(CASES):
+        print(f"❌ Expected {len(CASES)} batch responses, got {len(case_results)}")
         return False
     
-    time.sleep(2)
-    
-    # Test 4: Test TP4 specifically (mentioned in error)
-    print("\n--- Test 4: TP4 Order Specifically ---")
-    tp4_payload = {
-        "symbol": "SOL",
-        "side": "buy", 
-        "entry": "market",
-        "quantity": 0.2,
-        "tp4_price": 190.0,
-        "tp4_perc": 0.05
-    }
-    
-    try:
-        response = requests.post(url, json=tp4_payload)
-        print(f"TP4 Status Code: {response.status_code}")
+    for (label, _, extra_check), result in zip(CASES, case_results):
+        print(f"\n--- {label} ---")
         
-        if response.status_code == 200:
-            result = response.json()
-            print("✅ TP4 webhook received successfully")
-            
-            # Check for the specific TP4 'isMarket' error
-            response_str = json.dumps(result)
-            if "Error placing TP4 order" in response_str and "isMarket" in response_str:
-                print("❌ CRITICAL: Specific TP4 'isMarket' error still present!")
-                print("🚨 The user's exact error case is not fixed")
-                return False
-            elif "'isMarket'" in response_str or "isMarket" in response_str:
-                print("❌ CRITICAL: 'isMarket' error still present in TP4!")
-                return False
-            else:
-                print("✅ No 'isMarket' error detected in TP4 response")
-            
-            # Check if TP4 order was processed successfully
-            hl_response = result.get('hyperliquid_response', {})
-            if hl_response.get('status') == 'success':
-                print("✅ TP4 order processed successfully")
-                print("🎯 CRITICAL SUCCESS: TP4 'isMarket' error is FIXED!")
-            else:
-                print(f"❌ TP4 order failed: {hl_response}")
-                return False
-        else:
-            print(f"❌ TP4 webhook failed: {response.text}")
+        if not check_webhook_case(label, result, extra_check, ismarket_in_batch):
+            # Full response is only needed to debug a failing case
+            print(f"Response: {json.dumps(result, indent=2)}")
             return False
-            
-    except Exception as e:
-        print(f"❌ Error testing TP4: {str(e)}")
-        return False
     
-    time.sleep(2)
+    # No settling delay needed: the server stores each Hyperliquid response
+    # before the webhook call returns
     
     # Test 5: Verify orders appear as Limit orders (not Market)
     print("\n--- Test 5: Verify Order Types ---")
     print("🎯 Testing that TP/SL orders now appear as Limit orders, not Market orders")
     
-    # Check recent responses to see order types
-    responses_url = f"{BASE_URL}/responses"
+    # The server classifies the most recent responses and returns only the counts
+    counts_url = f"{BASE_URL}/responses/order-type-counts?limit=5"
     try:
-        responses_response = requests.get(responses_url)
-        if responses_response.status_code == 200:
-            responses_data = responses_response.json()
-            recent_responses = responses_data.get('responses', [])[:5]  # Last 5 responses
+        counts_response = get_session().get(counts_url, timeout=REQUEST_TIMEOUT)
+        if counts_response.status_code == 200:
+            counts = counts_response.json()
+            print(f"Checked {counts.get('checked', 0)} recent responses for order types...")
             
-            print(f"Checking {len(recent_responses)} recent responses for order types...")
-            
-            market_orders_found = 0
-            limit_orders_found = 0
-            
-            for resp in recent_responses:
-                response_data = resp.get('response_data', {})
-                response_str = json.dumps(response_data)
-                
-                # Look for order type indicators
-                if '"type": "market"' in response_str.lower() or '"order_type": "market"' in response_str.lower():
-                    market_orders_found += 1
-                elif '"type": "limit"' in response_str.lower() or '"order_type": "limit"' in response_str.lower():
-                    limit_orders_found += 1
+            market_orders_found = counts.get('market', 0)
+            limit_orders_found = counts.get('limit', 0)
             
             print(f"Found {market_orders_found} market orders and {limit_orders_found} limit orders in recent responses")
             
@@ -246,7 +185,7 @@ def test_simple_limit_orders_tp_sl():
                 print("⚠️ No clear limit order indicators found in recent responses")
                 
         else:
-            print(f"⚠️ Could not retrieve responses to check order types: {responses_response.status_code}")
+            print(f"⚠️ Could not retrieve order type counts: {counts_response.status_code}")
     except Exception as e:
         print(f"⚠️ Error checking order types: {str(e)}")
     
@@ -268,7 +207,7 @@ def test_status_endpoint():
     url = f"{BASE_URL}/status"
     
     try:
-        response = requests.get(url)
+        response = get_session().get(url, timeout=REQUEST_TIMEOUT)
         print(f"Status Code: {response.status_code}")
         
         if response.status_code == 200:
@@ -299,19 +238,28 @@ def run_simple_limit_tests():
     print("FOCUS: Testing new simple limit order implementation")
     print("=" * 80)
     print(f"Testing against: {BASE_URL}")
-    print(f"Test started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"Test started at: {_START_TS}")
     print("=" * 80)
     
-    # Track test results
-    results = {}
-    
-    # Test status endpoint first to ensure system is working
-    status_success = test_status_endpoint()
-    results["Status Endpoint"] = status_success
-    
-    # Test simple limit orders for TP/SL (MAIN FOCUS OF REVIEW REQUEST)
-    simple_limit_orders_success = test_simple_limit_orders_tp_sl()
-    results["Simple Limit Orders TP/SL"] = simple_limit_orders_success
+    # The status probe is independent of the order tests, so it runs in the
+    # background while the first webhook is in flight. The webhook cases
+    # themselves stay sequential: they all trade SOL and the server
+    # clears/reopens the SOL position on every webhook. The probe's output is
+    # captured and printed after the main test's, so the two don't interleave.
+    with ThreadPoolExecutor(max_workers=1) as executor, thread_local_stdout():
+        status_future = executor.submit(captured_output, test_status_endpoint)
+        
+        # Test simple limit orders for TP/SL (MAIN FOCUS OF REVIEW REQUEST)
+        simple_limit_orders_success = test_simple_limit_orders_tp_sl()
+        
+        status_passed, status_output = status_future.result()
+        sys.stdout.write(status_output)
+        
+        # Track test results
+        results = {
+            "Status Endpoint": status_passed,
+            "Simple Limit Orders TP/SL": simple_limit_orders_success
+        }
     
     # Print summary
     print("\n" + "=" * 80)
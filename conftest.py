@@ -0,0 +1,21 @@
+"""
+pytest configuration for the repository root.
+
+The test scripts at the root and in backend/ are standalone runners that hit
+the live API and Hyperliquid and place real orders. Their names match pytest's
+default test_*.py / *_test.py patterns, so they are excluded here to keep a
+plain `pytest` run from sending orders. Run them directly with python instead.
+"""
+
+collect_ignore = [
+    "backend_test.py",
+    "backend_test_simple_limit.py",
+    "market_order_test.py",
+    "position_clearing_test.py",
+    "position_test.py",
+    "test_position_management.py",
+    "test_stop_loss_comprehensive.py",
+    "test_stop_loss_only.py",
+]
+
+collect_ignore_glob = ["backend/test_*.py"]
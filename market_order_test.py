@@ -3,272 +3,347 @@
 Market Order Implementation and Position Management Testing
 Focus: Review request requirements for market orders, position management, and webhook execution
 """
-import requests
+import functools
+import logging
+import os
 import json
-import time
+import re
+import socket
 from datetime import datetime
 import sys
+import threading
+from dataclasses import dataclass
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from api_test_utils import REQUEST_TIMEOUT, get_session, wait_for_position
+
+log = logging.getLogger("mkt_test")
 
 # Base URL from frontend/.env
 BASE_URL = "https://strat-manager.preview.emergentagent.com/api"
 
+# Trailing UTC offset of an ISO timestamp, e.g. -03:00
+TZ_OFFSET_PATTERN = re.compile(r'([+-]\d{2}:\d{2})$')
+
+# Status values reported by the webhook wrapper and by Hyperliquid itself
+HL_SUCCESS = "success"
+ORDER_OK = "ok"
+
+@dataclass
+class HLResult:
+    """The parts of a webhook result's hyperliquid_response the tests inspect"""
+    raw: Optional[dict]           # hyperliquid_response as returned, None if missing
+    ok: bool                      # hyperliquid_response.status == HL_SUCCESS
+    order_details: dict
+    main_order: Optional[dict]    # order_details.hyperliquid_response
+    main_status: Optional[str]
+    main_ok: bool                 # main_status == ORDER_OK
+    response_type: Optional[str]  # main_order.response.type
+    statuses: list                # main_order.response.data.statuses
+    stop_loss: Optional[dict]     # order_details.stop_loss_response
+    stop_loss_ok: bool            # stop_loss.status == ORDER_OK
+
+def parse_hl_response(result):
+    """Walk result['hyperliquid_response'] once into an HLResult"""
+    hl_response = result.get('hyperliquid_response')
+    order_details = (hl_response or {}).get('order_details') or {}
+    main_order = order_details.get('hyperliquid_response')
+    main_response = (main_order or {}).get('response') or {}
+    main_status = (main_order or {}).get('status')
+    stop_loss = order_details.get('stop_loss_response')
+    
+    return HLResult(
+        raw=hl_response,
+        ok=bool(hl_response) and hl_response.get('status') == HL_SUCCESS,
+        order_details=order_details,
+        main_order=main_order,
+        main_status=main_status,
+        main_ok=main_status == ORDER_OK,
+        response_type=main_response.get('type'),
+        statuses=(main_response.get('data') or {}).get('statuses', []),
+        stop_loss=stop_loss,
+        stop_loss_ok=bool(stop_loss) and stop_loss.get('status') == ORDER_OK
+    )
+
+class LazyJSON:
+    """Defers json.dumps(obj, indent=2) until a log record is actually emitted"""
+    __slots__ = ("obj",)
+    
+    def __init__(self, obj):
+        self.obj = obj
+    
+    def __str__(self):
+        return json.dumps(self.obj, indent=2)
+
+# Log records held back for tests running in a background thread, so their
+# report is written in one piece after the foreground tests instead of
+# interleaving with them
+_log_buffer = threading.local()
+
+class _ThreadBufferFilter(logging.Filter):
+    """Divert records into the calling thread's buffer when it has one"""
+    def filter(self, record):
+        records = getattr(_log_buffer, "records", None)
+        if records is None:
+            return True
+        records.append(record)
+        return False
+
+log.addFilter(_ThreadBufferFilter())
+
+def buffered_log_records(test_fn):
+    """Run test_fn with its log records buffered; returns (result, records)
+    so the caller can replay them with log.handle() once it is done"""
+    @functools.wraps(test_fn)
+    def wrapper(*args, **kwargs):
+        _log_buffer.records = []
+        try:
+            return test_fn(*args, **kwargs), _log_buffer.records
+        finally:
+            del _log_buffer.records
+    return wrapper
+
+def make_payload(symbol, side, quantity, **extra):
+    """Build a market order webhook payload stamped with the current time"""
+    return {
+        "symbol": symbol,
+        "side": side,
+        "entry": "market",
+        "quantity": quantity,
+        "timestamp": datetime.now().isoformat(),
+        **extra
+    }
+
 def test_market_open_method():
     """Test 1: market_open method implementation for market orders"""
-    print("\n" + "="*80)
-    print("TEST 1: MARKET ORDER IMPLEMENTATION (market_open method)")
-    print("="*80)
-    print("🎯 FOCUS: Verify market orders are executed as TRUE market orders (not limit)")
-    print("📋 Requirements: entry='market', symbol='SOL', side='buy', quantity=0.5")
+    log.info("\n" + "="*80)
+    log.info("TEST 1: MARKET ORDER IMPLEMENTATION (market_open method)")
+    log.info("="*80)
+    log.info("🎯 FOCUS: Verify market orders are executed as TRUE market orders (not limit)")
+    log.info("📋 Requirements: entry='market', symbol='SOL', side='buy', quantity=0.5")
     
     # Test payload as specified in review request
-    market_order_payload = {
-        "symbol": "SOL",
-        "side": "buy", 
-        "entry": "market",  # This should trigger market_open method
-        "quantity": "0.5",  # Realistic SOL amount as requested
-        "timestamp": datetime.now().isoformat()
-    }
+    # entry=market should trigger the market_open method; 0.5 is a realistic SOL amount
+    market_order_payload = make_payload("SOL", "buy", "0.5")
     
-    print(f"📤 Sending webhook: {json.dumps(market_order_payload, indent=2)}")
+    log.debug("📤 Sending webhook: %s", LazyJSON(market_order_payload))
     
     url = f"{BASE_URL}/webhook/tradingview"
     
     try:
-        response = requests.post(url, json=market_order_payload)
-        print(f"\n📊 Response Status Code: {response.status_code}")
+        response = get_session().post(url, json=market_order_payload, timeout=REQUEST_TIMEOUT)
+        log.info(f"\n📊 Response Status Code: {response.status_code}")
         
         if response.status_code == 200:
             result = response.json()
-            print("✅ Webhook received successfully")
-            print(f"📋 Full Response: {json.dumps(result, indent=2)}")
+            log.info("✅ Webhook received successfully")
+            log.debug("📋 Full Response: %s", LazyJSON(result))
             
             # Check Hyperliquid response structure
-            hl_response = result.get('hyperliquid_response', {})
+            hl = parse_hl_response(result)
             
-            if hl_response.get('status') == 'success':
-                print("\n🔍 ANALYZING HYPERLIQUID RESPONSE STRUCTURE:")
+            if hl.ok:
+                log.info("\n🔍 ANALYZING HYPERLIQUID RESPONSE STRUCTURE:")
                 
-                # Look for order details
-                order_details = hl_response.get('order_details', {})
-                main_order_response = order_details.get('hyperliquid_response', {})
-                
-                print(f"📊 Main Order Response: {json.dumps(main_order_response, indent=2)}")
+                log.debug("📊 Main Order Response: %s", LazyJSON(hl.main_order))
                 
                 # Verify it's a market order (not limit)
-                if main_order_response.get('status') == 'ok':
-                    print("✅ Order executed successfully on Hyperliquid")
+                if hl.main_ok:
+                    log.info("✅ Order executed successfully on Hyperliquid")
                     
                     # Check response data for order type indicators
-                    response_data = main_order_response.get('response', {})
-                    if response_data.get('type') == 'order':
-                        order_data = response_data.get('data', {})
-                        statuses = order_data.get('statuses', [])
-                        
-                        print(f"📋 Order Statuses: {statuses}")
+                    if hl.response_type == 'order':
+                        log.info(f"📋 Order Statuses: {hl.statuses}")
                         
                         # Look for market order indicators
                         market_order_confirmed = False
-                        for status in statuses:
+                        for status in hl.statuses:
                             if isinstance(status, dict):
                                 if 'filled' in status:
-                                    print("✅ Order shows 'filled' status - indicates market execution")
+                                    log.info("✅ Order shows 'filled' status - indicates market execution")
                                     market_order_confirmed = True
                                 elif 'resting' in status:
-                                    print("⚠️ Order shows 'resting' status - might be limit order behavior")
+                                    log.warning("⚠️ Order shows 'resting' status - might be limit order behavior")
                                     # Check if it has market-like characteristics
                                     resting_info = status.get('resting', {})
-                                    print(f"📋 Resting Order Info: {resting_info}")
+                                    log.info(f"📋 Resting Order Info: {resting_info}")
                         
                         if market_order_confirmed:
-                            print("🎯 ✅ MARKET ORDER CONFIRMED: Order executed as TRUE market order")
+                            log.info("🎯 ✅ MARKET ORDER CONFIRMED: Order executed as TRUE market order")
                             return True
                         else:
-                            print("🎯 ⚠️ MARKET ORDER UNCLEAR: Need to verify order type in Hyperliquid")
+                            log.info("🎯 ⚠️ MARKET ORDER UNCLEAR: Need to verify order type in Hyperliquid")
                             return True  # Still successful execution
                     else:
-                        print(f"⚠️ Unexpected response type: {response_data.get('type')}")
+                        log.warning(f"⚠️ Unexpected response type: {hl.response_type}")
                         return True  # Still successful execution
                 else:
-                    print(f"❌ Order execution failed: {main_order_response}")
+                    log.error(f"❌ Order execution failed: {hl.main_order}")
                     return False
             else:
-                print(f"❌ Hyperliquid response failed: {hl_response}")
+                log.error(f"❌ Hyperliquid response failed: {hl.raw}")
                 return False
         else:
-            print(f"❌ Webhook failed: {response.text}")
+            log.error(f"❌ Webhook failed: {response.text}")
             return False
             
     except Exception as e:
-        print(f"❌ Error testing market order: {str(e)}")
+        log.error(f"❌ Error testing market order: {str(e)}")
         return False
 
-def test_market_close_method():
-    """Test 2: market_close method for position closing"""
-    print("\n" + "="*80)
-    print("TEST 2: MARKET CLOSE METHOD FOR POSITION CLOSING")
-    print("="*80)
-    print("🎯 FOCUS: Verify position closing works correctly (no null responses)")
+def test_market_close_method(reuse_open_position=False):
+    """Test 2: market_close method for position closing
     
-    # First, create a position to close
-    print("\n--- Step 1: Creating a position to close ---")
-    create_position_payload = {
-        "symbol": "SOL",
-        "side": "buy",
-        "entry": "market",
-        "quantity": "0.5",
-        "timestamp": datetime.now().isoformat()
-    }
+    With reuse_open_position the 0.5 SOL long opened by test_market_open_method
+    is closed instead of opening a fresh one, provided the long is actually
+    visible; Test 1 also passes when its order only rested on the book.
+    """
+    log.info("\n" + "="*80)
+    log.info("TEST 2: MARKET CLOSE METHOD FOR POSITION CLOSING")
+    log.info("="*80)
+    log.info("🎯 FOCUS: Verify position closing works correctly (no null responses)")
     
     url = f"{BASE_URL}/webhook/tradingview"
     
     try:
-        # Create position
-        create_response = requests.post(url, json=create_position_payload)
-        if create_response.status_code == 200:
-            create_result = create_response.json()
-            print("✅ Position creation webhook sent")
-            
-            # Wait for position to be established
-            time.sleep(3)
-            
+        # Reuse Test 1's long only once it is confirmed open; otherwise the
+        # sell below would open a short instead of testing a close
+        if reuse_open_position and wait_for_position(BASE_URL, "SOL", "long", timeout=2):
+            log.info("\n--- Step 1: Reusing the SOL long opened by the market order test ---")
+            position_created = True
+        else:
+            # First, create a position to close
+            log.info("\n--- Step 1: Creating a position to close ---")
+            create_position_payload = make_payload("SOL", "buy", "0.5")
+            create_response = get_session().post(url, json=create_position_payload, timeout=REQUEST_TIMEOUT)
+            position_created = create_response.status_code == 200
+            if position_created:
+                log.info("✅ Position creation webhook sent")
+                
+                # Wait for position to be established
+                if not wait_for_position(BASE_URL, "SOL", "long", timeout=10):
+                    log.warning("⚠️ SOL long position not visible yet - closing anyway")
+        
+        if position_created:
             # Now test closing the position
-            print("\n--- Step 2: Testing position closing ---")
-            close_position_payload = {
-                "symbol": "SOL", 
-                "side": "sell",  # Opposite side to close
-                "entry": "market",
-                "quantity": "0.5",  # Same quantity to close position
-                "timestamp": datetime.now().isoformat()
-            }
+            log.info("\n--- Step 2: Testing position closing ---")
+            # Opposite side and same quantity to close the position
+            close_position_payload = make_payload("SOL", "sell", "0.5")
             
-            close_response = requests.post(url, json=close_position_payload)
-            print(f"📊 Close Response Status Code: {close_response.status_code}")
+            close_response = get_session().post(url, json=close_position_payload, timeout=REQUEST_TIMEOUT)
+            log.info(f"📊 Close Response Status Code: {close_response.status_code}")
             
             if close_response.status_code == 200:
                 close_result = close_response.json()
-                print("✅ Position close webhook received successfully")
-                print(f"📋 Close Response: {json.dumps(close_result, indent=2)}")
+                log.info("✅ Position close webhook received successfully")
+                log.debug("📋 Close Response: %s", LazyJSON(close_result))
                 
                 # Check for null responses
-                hl_response = close_result.get('hyperliquid_response')
+                hl = parse_hl_response(close_result)
                 
-                if hl_response is None:
-                    print("❌ CRITICAL: Hyperliquid response is NULL")
+                if hl.raw is None:
+                    log.error("❌ CRITICAL: Hyperliquid response is NULL")
                     return False
-                elif hl_response.get('status') == 'success':
-                    print("✅ Position close operation returned non-null response")
+                elif hl.ok:
+                    log.info("✅ Position close operation returned non-null response")
                     
                     # Check order details
-                    order_details = hl_response.get('order_details', {})
-                    if order_details:
-                        print("✅ Order details present in response")
-                        main_order = order_details.get('hyperliquid_response')
+                    if hl.order_details:
+                        log.info("✅ Order details present in response")
                         
-                        if main_order is None:
-                            print("❌ CRITICAL: Main order response is NULL")
+                        if hl.main_order is None:
+                            log.error("❌ CRITICAL: Main order response is NULL")
                             return False
                         else:
-                            print("✅ Main order response is non-null")
-                            print(f"📊 Main Order Status: {main_order.get('status')}")
+                            log.info("✅ Main order response is non-null")
+                            log.info(f"📊 Main Order Status: {hl.main_status}")
                             
-                            if main_order.get('status') == 'ok':
-                                print("🎯 ✅ POSITION CLOSE CONFIRMED: market_close method working correctly")
+                            if hl.main_ok:
+                                log.info("🎯 ✅ POSITION CLOSE CONFIRMED: market_close method working correctly")
                                 return True
                             else:
-                                print(f"⚠️ Order status not 'ok': {main_order.get('status')}")
+                                log.warning(f"⚠️ Order status not '{ORDER_OK}': {hl.main_status}")
                                 return True  # Still non-null response
                     else:
-                        print("⚠️ No order details in response")
+                        log.warning("⚠️ No order details in response")
                         return True  # Still non-null response
                 else:
-                    print(f"❌ Position close failed: {hl_response}")
+                    log.error(f"❌ Position close failed: {hl.raw}")
                     return False
             else:
-                print(f"❌ Position close webhook failed: {close_response.text}")
+                log.error(f"❌ Position close webhook failed: {close_response.text}")
                 return False
         else:
-            print(f"❌ Position creation failed: {create_response.text}")
+            log.error(f"❌ Position creation failed: {create_response.text}")
             return False
             
     except Exception as e:
-        print(f"❌ Error testing position closing: {str(e)}")
+        log.error(f"❌ Error testing position closing: {str(e)}")
         return False
 
 def test_position_inversion():
     """Test 3: Position inversion (long -> short)"""
-    print("\n" + "="*80)
-    print("TEST 3: POSITION INVERSION TESTING")
-    print("="*80)
-    print("🎯 FOCUS: Open long position, then short position")
-    print("📋 Requirements: Verify long position is closed and short position is opened")
+    log.info("\n" + "="*80)
+    log.info("TEST 3: POSITION INVERSION TESTING")
+    log.info("="*80)
+    log.info("🎯 FOCUS: Open long position, then short position")
+    log.info("📋 Requirements: Verify long position is closed and short position is opened")
     
     # Step 1: Open long position
-    print("\n--- Step 1: Opening LONG position ---")
-    long_position_payload = {
-        "symbol": "SOL",
-        "side": "buy",
-        "entry": "market", 
-        "quantity": "1.0",  # Realistic SOL amount
-        "timestamp": datetime.now().isoformat()
-    }
+    log.info("\n--- Step 1: Opening LONG position ---")
+    long_position_payload = make_payload("SOL", "buy", "1.0")
     
     url = f"{BASE_URL}/webhook/tradingview"
     
     try:
-        long_response = requests.post(url, json=long_position_payload)
-        print(f"📊 Long Position Status Code: {long_response.status_code}")
+        long_response = get_session().post(url, json=long_position_payload, timeout=REQUEST_TIMEOUT)
+        log.info(f"📊 Long Position Status Code: {long_response.status_code}")
         
         if long_response.status_code == 200:
             long_result = long_response.json()
-            print("✅ Long position webhook received successfully")
+            log.info("✅ Long position webhook received successfully")
             
-            hl_response = long_result.get('hyperliquid_response', {})
-            if hl_response.get('status') == 'success':
-                print("✅ Long position opened successfully")
+            long_hl = parse_hl_response(long_result)
+            if long_hl.ok:
+                log.info("✅ Long position opened successfully")
                 
                 # Wait for position to be established
-                time.sleep(5)
+                if not wait_for_position(BASE_URL, "SOL", "long", timeout=10):
+                    log.warning("⚠️ SOL long position not visible yet - inverting anyway")
                 
                 # Step 2: Open short position (should close long and open short)
-                print("\n--- Step 2: Opening SHORT position (should invert) ---")
-                short_position_payload = {
-                    "symbol": "SOL",
-                    "side": "sell",
-                    "entry": "market",
-                    "quantity": "1.0",  # Same amount to test inversion
-                    "timestamp": datetime.now().isoformat()
-                }
+                log.info("\n--- Step 2: Opening SHORT position (should invert) ---")
+                # Same amount to test inversion
+                short_position_payload = make_payload("SOL", "sell", "1.0")
                 
-                short_response = requests.post(url, json=short_position_payload)
-                print(f"📊 Short Position Status Code: {short_response.status_code}")
+                short_response = get_session().post(url, json=short_position_payload, timeout=REQUEST_TIMEOUT)
+                log.info(f"📊 Short Position Status Code: {short_response.status_code}")
                 
                 if short_response.status_code == 200:
                     short_result = short_response.json()
-                    print("✅ Short position webhook received successfully")
-                    print(f"📋 Short Response: {json.dumps(short_result, indent=2)}")
+                    log.info("✅ Short position webhook received successfully")
+                    log.debug("📋 Short Response: %s", LazyJSON(short_result))
                     
-                    hl_response = short_result.get('hyperliquid_response', {})
-                    if hl_response.get('status') == 'success':
-                        print("✅ Short position processed successfully")
+                    short_hl = parse_hl_response(short_result)
+                    if short_hl.ok:
+                        log.info("✅ Short position processed successfully")
                         
                         # Check if position management occurred
-                        order_details = hl_response.get('order_details', {})
-                        main_order = order_details.get('hyperliquid_response', {})
-                        
-                        if main_order.get('status') == 'ok':
-                            print("🎯 ✅ POSITION INVERSION CONFIRMED: System handled position change")
-                            print("📋 Expected behavior: Long position closed, short position opened")
+                        if short_hl.main_ok:
+                            log.info("🎯 ✅ POSITION INVERSION CONFIRMED: System handled position change")
+                            log.info("📋 Expected behavior: Long position closed, short position opened")
                             
                             # Look for additional responses that might indicate position closing
-                            print("\n🔍 Checking for position management responses...")
+                            log.info("\n🔍 Checking for position management responses...")
                             
                             # Check responses endpoint for position close operations
-                            responses_url = f"{BASE_URL}/responses"
+                            responses_url = f"{BASE_URL}/responses?limit=5"
                             try:
-                                responses_resp = requests.get(responses_url)
+                                responses_resp = get_session().get(responses_url, timeout=REQUEST_TIMEOUT)
                                 if responses_resp.status_code == 200:
                                     responses_data = responses_resp.json()
-                                    recent_responses = responses_data.get('responses', [])[:5]
+                                    recent_responses = responses_data.get('responses', [])
                                     
                                     close_operations = 0
                                     for resp in recent_responses:
@@ -276,277 +351,248 @@ def test_position_inversion():
                                         operation = resp_data.get('operation', '')
                                         if operation == 'close_position':
                                             close_operations += 1
-                                            print(f"✅ Found position close operation: {resp_data.get('message', '')}")
+                                            log.info(f"✅ Found position close operation: {resp_data.get('message', '')}")
                                     
                                     if close_operations > 0:
-                                        print(f"🎯 ✅ POSITION MANAGEMENT CONFIRMED: {close_operations} close operations detected")
+                                        log.info(f"🎯 ✅ POSITION MANAGEMENT CONFIRMED: {close_operations} close operations detected")
                                     else:
-                                        print("⚠️ No explicit close operations found, but inversion may still work")
+                                        log.warning("⚠️ No explicit close operations found, but inversion may still work")
                                         
                             except Exception as resp_error:
-                                print(f"⚠️ Could not check responses: {resp_error}")
+                                log.warning(f"⚠️ Could not check responses: {resp_error}")
                             
                             return True
                         else:
-                            print(f"❌ Short position order failed: {main_order}")
+                            log.error(f"❌ Short position order failed: {short_hl.main_order}")
                             return False
                     else:
-                        print(f"❌ Short position processing failed: {hl_response}")
+                        log.error(f"❌ Short position processing failed: {short_hl.raw}")
                         return False
                 else:
-                    print(f"❌ Short position webhook failed: {short_response.text}")
+                    log.error(f"❌ Short position webhook failed: {short_response.text}")
                     return False
             else:
-                print(f"❌ Long position failed: {hl_response}")
+                log.error(f"❌ Long position failed: {long_hl.raw}")
                 return False
         else:
-            print(f"❌ Long position webhook failed: {long_response.text}")
+            log.error(f"❌ Long position webhook failed: {long_response.text}")
             return False
             
     except Exception as e:
-        print(f"❌ Error testing position inversion: {str(e)}")
+        log.error(f"❌ Error testing position inversion: {str(e)}")
         return False
 
 def test_webhook_re_execute():
     """Test 4: Webhook re-execution flow with stop loss"""
-    print("\n" + "="*80)
-    print("TEST 4: WEBHOOK RE-EXECUTION FLOW")
-    print("="*80)
-    print("🎯 FOCUS: Use /api/webhook/re-execute endpoint")
-    print("📋 Requirements: Verify both main order and stop loss order placement")
+    log.info("\n" + "="*80)
+    log.info("TEST 4: WEBHOOK RE-EXECUTION FLOW")
+    log.info("="*80)
+    log.info("🎯 FOCUS: Use /api/webhook/re-execute endpoint")
+    log.info("📋 Requirements: Verify both main order and stop loss order placement")
     
     # Test payload with stop loss
     webhook_payload = {
-        "payload": {
-            "symbol": "SOL",
-            "side": "buy",
-            "entry": "market",
-            "quantity": "0.5",
-            "stop": "155.00",  # Stop loss price
-            "timestamp": datetime.now().isoformat()
-        }
+        "payload": make_payload("SOL", "buy", "0.5", stop="155.00")  # Stop loss price
     }
     
-    print(f"📤 Re-executing webhook: {json.dumps(webhook_payload, indent=2)}")
+    log.debug("📤 Re-executing webhook: %s", LazyJSON(webhook_payload))
     
     url = f"{BASE_URL}/webhook/re-execute"
     
     try:
-        response = requests.post(url, json=webhook_payload)
-        print(f"📊 Re-execute Status Code: {response.status_code}")
+        response = get_session().post(url, json=webhook_payload, timeout=REQUEST_TIMEOUT)
+        log.info(f"📊 Re-execute Status Code: {response.status_code}")
         
         if response.status_code == 200:
             result = response.json()
-            print("✅ Webhook re-execution successful")
-            print(f"📋 Re-execute Response: {json.dumps(result, indent=2)}")
+            log.info("✅ Webhook re-execution successful")
+            log.debug("📋 Re-execute Response: %s", LazyJSON(result))
             
             # Check the response structure
-            if result.get('status') == 'success':
+            if result.get('status') == HL_SUCCESS:
                 webhook_id = result.get('webhook_id')
-                hl_response = result.get('hyperliquid_response', {})
+                hl = parse_hl_response(result)
                 
-                print(f"📋 Webhook ID: {webhook_id}")
-                print(f"📊 Hyperliquid Response: {json.dumps(hl_response, indent=2)}")
+                log.info(f"📋 Webhook ID: {webhook_id}")
+                log.debug("📊 Hyperliquid Response: %s", LazyJSON(hl.raw))
                 
-                if hl_response.get('status') == 'success':
-                    print("✅ Main order execution successful")
+                if hl.ok:
+                    log.info("✅ Main order execution successful")
                     
                     # Check for stop loss order
-                    order_details = hl_response.get('order_details', {})
-                    stop_loss_response = order_details.get('stop_loss_response')
+                    stop_loss_response = hl.stop_loss
                     
                     if stop_loss_response:
-                        print("✅ Stop loss response found")
-                        print(f"📊 Stop Loss Response: {json.dumps(stop_loss_response, indent=2)}")
+                        log.info("✅ Stop loss response found")
+                        log.debug("📊 Stop Loss Response: %s", LazyJSON(stop_loss_response))
                         
-                        if stop_loss_response.get('status') == 'ok':
-                            print("🎯 ✅ WEBHOOK RE-EXECUTION CONFIRMED: Both main and stop loss orders processed")
+                        if hl.stop_loss_ok:
+                            log.info("🎯 ✅ WEBHOOK RE-EXECUTION CONFIRMED: Both main and stop loss orders processed")
                             return True
                         else:
-                            print(f"⚠️ Stop loss order status: {stop_loss_response.get('status')}")
+                            log.warning(f"⚠️ Stop loss order status: {stop_loss_response.get('status')}")
                             return True  # Main order still worked
                     else:
-                        print("⚠️ No stop loss response found")
+                        log.warning("⚠️ No stop loss response found")
                         return True  # Main order still worked
                 else:
-                    print(f"❌ Hyperliquid response failed: {hl_response}")
+                    log.error(f"❌ Hyperliquid response failed: {hl.raw}")
                     return False
             else:
-                print(f"❌ Re-execution failed: {result}")
+                log.error(f"❌ Re-execution failed: {result}")
                 return False
         else:
-            print(f"❌ Re-execute webhook failed: {response.text}")
+            log.error(f"❌ Re-execute webhook failed: {response.text}")
             return False
             
     except Exception as e:
-        print(f"❌ Error testing webhook re-execution: {str(e)}")
+        log.error(f"❌ Error testing webhook re-execution: {str(e)}")
         return False
 
 def test_brazilian_timezone_logging():
     """Test 5: Brazilian timezone logging verification"""
-    print("\n" + "="*80)
-    print("TEST 5: BRAZILIAN TIMEZONE LOGGING")
-    print("="*80)
-    print("🎯 FOCUS: Verify Brazilian timezone (GMT-3) is working in logs")
+    log.info("\n" + "="*80)
+    log.info("TEST 5: BRAZILIAN TIMEZONE LOGGING")
+    log.info("="*80)
+    log.info("🎯 FOCUS: Verify Brazilian timezone (GMT-3) is working in logs")
     
     # Generate some logs by calling endpoints
-    print("\n--- Generating logs by calling status endpoint ---")
+    log.info("\n--- Generating logs by calling status endpoint ---")
     status_url = f"{BASE_URL}/status"
     
     try:
         # Call status to generate logs
-        status_response = requests.get(status_url)
+        status_response = get_session().get(status_url, timeout=REQUEST_TIMEOUT)
         if status_response.status_code == 200:
-            print("✅ Status endpoint called to generate logs")
+            log.info("✅ Status endpoint called to generate logs")
         
-        # Wait for logs to be written
-        time.sleep(2)
+        # No wait for fresh entries: Tests 1-4 write logs concurrently, so any
+        # new entry would not prove the status call's logs had landed. Only the
+        # timestamp format matters here, which every recent entry carries.
         
         # Check logs for Brazilian timezone
-        logs_url = f"{BASE_URL}/logs"
-        logs_response = requests.get(logs_url)
+        logs_url = f"{BASE_URL}/logs?limit=5"
+        logs_response = get_session().get(logs_url, timeout=REQUEST_TIMEOUT)
         
         if logs_response.status_code == 200:
             logs_data = logs_response.json()
             logs = logs_data.get('logs', [])
             
-            print(f"📊 Retrieved {len(logs)} logs")
+            log.info(f"📊 Retrieved {len(logs)} logs")
             
             if len(logs) > 0:
-                print("\n🕐 Checking Brazilian timezone in recent logs:")
+                log.info("\n🕐 Checking Brazilian timezone in recent logs:")
                 
                 brazilian_timezone_found = False
-                for i, log in enumerate(logs[:5]):  # Check first 5 logs
-                    timestamp = log.get('timestamp', '')
-                    message = log.get('message', '')
-                    level = log.get('level', '')
+                for i, entry in enumerate(logs[:5]):  # Check first 5 logs
+                    timestamp = entry.get('timestamp', '')
+                    message = entry.get('message', '')
+                    level = entry.get('level', '')
                     
-                    print(f"\nLog {i+1}: [{level}] {message}")
-                    print(f"  Timestamp: {timestamp}")
+                    log.info(f"\nLog {i+1}: [{level}] {message}")
+                    log.info(f"  Timestamp: {timestamp}")
                     
                     # Check for Brazilian timezone indicators
                     if '-03:00' in timestamp:
-                        print("  ✅ Brazilian timezone (GMT-3) detected!")
+                        log.info("  ✅ Brazilian timezone (GMT-3) detected!")
                         brazilian_timezone_found = True
+                        break
                     elif timestamp:
                         # Parse for other timezone patterns
-                        import re
-                        tz_pattern = r'([+-]\d{2}:\d{2})$'
-                        tz_match = re.search(tz_pattern, timestamp)
+                        tz_match = TZ_OFFSET_PATTERN.search(timestamp)
                         
                         if tz_match:
                             tz_offset = tz_match.group(1)
-                            print(f"  ⚠️ Timezone offset: {tz_offset} (expected -03:00)")
+                            log.warning(f"  ⚠️ Timezone offset: {tz_offset} (expected -03:00)")
                         else:
-                            print("  ⚠️ No timezone offset found")
+                            log.warning("  ⚠️ No timezone offset found")
                     else:
-                        print("  ❌ No timestamp found")
+                        log.error("  ❌ No timestamp found")
                 
                 if brazilian_timezone_found:
-                    print("\n🎯 ✅ BRAZILIAN TIMEZONE CONFIRMED: GMT-3 working correctly")
+                    log.info("\n🎯 ✅ BRAZILIAN TIMEZONE CONFIRMED: GMT-3 working correctly")
                     return True
                 else:
-                    print("\n⚠️ Brazilian timezone not clearly detected in logs")
+                    log.warning("\n⚠️ Brazilian timezone not clearly detected in logs")
                     return False
             else:
-                print("⚠️ No logs found to check timezone")
+                log.warning("⚠️ No logs found to check timezone")
                 return False
         else:
-            print(f"❌ Failed to retrieve logs: {logs_response.text}")
+            log.error(f"❌ Failed to retrieve logs: {logs_response.text}")
             return False
             
     except Exception as e:
-        print(f"❌ Error testing Brazilian timezone: {str(e)}")
+        log.error(f"❌ Error testing Brazilian timezone: {str(e)}")
         return False
 
 def run_market_order_tests():
     """Run all market order and position management tests"""
-    print("=" * 80)
-    print("MARKET ORDER IMPLEMENTATION AND POSITION MANAGEMENT TESTING")
-    print("Focus: Review request requirements")
-    print("=" * 80)
-    print(f"Testing against: {BASE_URL}")
-    print(f"Test started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print("=" * 80)
-    
-    # Track test results
-    results = {}
-    
-    # Test 1: Market order implementation
-    print("\n🚀 Starting Test 1: Market Order Implementation...")
-    results["Market Order Implementation"] = test_market_open_method()
-    
-    # Test 2: Market close method
-    print("\n🚀 Starting Test 2: Market Close Method...")
-    results["Market Close Method"] = test_market_close_method()
-    
-    # Test 3: Position inversion
-    print("\n🚀 Starting Test 3: Position Inversion...")
-    results["Position Inversion"] = test_position_inversion()
+    log.info("=" * 80)
+    log.info("MARKET ORDER IMPLEMENTATION AND POSITION MANAGEMENT TESTING")
+    log.info("Focus: Review request requirements")
+    log.info("=" * 80)
+    log.info(f"Testing against: {BASE_URL}")
+    log.info(f"Test started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    log.info("=" * 80)
     
-    # Test 4: Webhook re-execution
-    print("\n🚀 Starting Test 4: Webhook Re-execution...")
-    results["Webhook Re-execution"] = test_webhook_re_execute()
-    
-    # Test 5: Brazilian timezone logging
-    print("\n🚀 Starting Test 5: Brazilian Timezone Logging...")
-    results["Brazilian Timezone Logging"] = test_brazilian_timezone_logging()
-    
-    # Print summary
-    print("\n" + "=" * 80)
-    print("TEST SUMMARY - MARKET ORDER AND POSITION MANAGEMENT")
-    print("=" * 80)
-    
-    all_passed = True
-    critical_failures = []
-    
-    for test_name, passed in results.items():
-        status = "✅ PASSED" if passed else "❌ FAILED"
-        print(f"{test_name}: {status}")
-        if not passed:
-            all_passed = False
-            critical_failures.append(test_name)
-    
-    print(f"\nOVERALL RESULT: {'✅ ALL TESTS PASSED' if all_passed else '❌ SOME TESTS FAILED'}")
-    
-    if critical_failures:
-        print(f"\n🚨 CRITICAL FAILURES: {', '.join(critical_failures)}")
-        print("These tests need attention based on the review request requirements.")
-    
-    # Key findings summary
-    print("\n" + "=" * 80)
-    print("KEY FINDINGS SUMMARY")
-    print("=" * 80)
+    # Resolve the host once up front: warms the resolver cache for the first
+    # pooled connection and fails fast instead of five tests timing out
+    host = urlparse(BASE_URL).hostname
+    try:
+        socket.getaddrinfo(host, 443, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        log.error(f"❌ Cannot resolve {host}: {e}")
+        return False
     
-    if results.get("Market Order Implementation"):
-        print("✅ Market orders are being executed (market_open method working)")
-    else:
-        print("❌ Market order implementation needs attention")
+    # Tests 1-4 all trade SOL and the server clears/reopens the SOL position on
+    # every webhook, so they run in order. Test 5 only reads status and logs,
+    # so it runs in the background alongside them.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # Test 5: Brazilian timezone logging
+        log.info("\n🚀 Starting Test 5 in background: Brazilian Timezone Logging...")
+        timezone_future = executor.submit(buffered_log_records(test_brazilian_timezone_logging))
+        
+        # Track test results
+        results = {}
+        
+        # Test 1: Market order implementation
+        log.info("\n🚀 Starting Test 1: Market Order Implementation...")
+        results["Market Order Implementation"] = test_market_open_method()
         
-    if results.get("Market Close Method"):
-        print("✅ Position closing works correctly (no null responses)")
-    else:
-        print("❌ Market close method returning null or failing")
+        # Test 2: Market close method - closes the position Test 1 opened when it succeeded
+        log.info("\n🚀 Starting Test 2: Market Close Method...")
+        results["Market Close Method"] = test_market_close_method(
+            reuse_open_position=results["Market Order Implementation"]
+        )
         
-    if results.get("Position Inversion"):
-        print("✅ Position inversion working (long->short transition)")
-    else:
-        print("❌ Position inversion not working correctly")
+        # Test 3: Position inversion
+        log.info("\n🚀 Starting Test 3: Position Inversion...")
+        results["Position Inversion"] = test_position_inversion()
         
-    if results.get("Webhook Re-execution"):
-        print("✅ Webhook re-execution flow working with stop loss")
-    else:
-        print("❌ Webhook re-execution or stop loss placement failing")
+        # Test 4: Webhook re-execution
+        log.info("\n🚀 Starting Test 4: Webhook Re-execution...")
+        results["Webhook Re-execution"] = test_webhook_re_execute()
         
-    if results.get("Brazilian Timezone Logging"):
-        print("✅ Brazilian timezone (GMT-3) working in logs")
-    else:
-        print("❌ Brazilian timezone not working correctly")
+        # Write Test 5's report only now, after Tests 1-4 have finished theirs
+        results["Brazilian Timezone Logging"], timezone_records = timezone_future.result()
+        for record in timezone_records:
+            log.handle(record)
     
-    print("=" * 80)
+    # One machine-readable line plus a one-line human summary
+    critical_failures = [name for name, passed in results.items() if not passed]
+    all_passed = not critical_failures
+    summary = {"results": results, "passed": all_passed, "failed": critical_failures}
+    # Failed runs report at ERROR so the summary survives MKT_TEST_LOG=WARNING
+    summary_level = logging.INFO if all_passed else logging.ERROR
+    log.log(summary_level, json.dumps(summary, separators=(",", ":")))
+    log.log(summary_level, f"PASS: {sum(results.values())}/{len(results)}")
     
     return all_passed
 
 if __name__ == "__main__":
+    # MKT_TEST_LOG=DEBUG also dumps full request/response JSON;
+    # MKT_TEST_LOG=WARNING keeps only warnings, failures and a failed summary
+    logging.basicConfig(level=os.getenv("MKT_TEST_LOG", "INFO"), stream=sys.stdout, format="%(message)s")
     success = run_market_order_tests()
     sys.exit(0 if success else 1)
\ No newline at end of file
@@ -3,13 +3,84 @@
 Specific test for position clearing mechanism - CRITICAL FOCUS
 Tests the exact user scenario: -10.73 SOL position clearing
 """
-import requests
 import json
-import time
+import re
+from collections import deque
 from datetime import datetime
+from api_test_utils import REQUEST_TIMEOUT, get_session, COMPACT_JSON, JSON_HEADERS, VERBOSE, wait_for_position
 
 BASE_URL = "https://strat-manager.preview.emergentagent.com/api"
 
+# Any of these in a log message marks it as position clearing activity
+CLEARING_LOG_KEYWORDS = [
+    'market_close',
+    'closing position',
+    'clear_symbol_orders',
+    'position clearing',
+    'exchange.market_close',
+    'fallback',
+    'reduce_only',
+    'failed to clear'
+]
+CLEARING_LOG_PATTERN = re.compile("|".join(map(re.escape, CLEARING_LOG_KEYWORDS)), re.IGNORECASE)
+
+# Step 1: opens a small SOL short
+SHORT_SOL_PAYLOAD = {
+    "symbol": "SOL",
+    "side": "sell",  # Create short position
+    "entry": "market",
+    "quantity": "0.5",  # Small position for testing
+    "price": "180.00"
+}
+
+# Step 3: opposite side and larger size, so the short must be cleared first
+BUY_SOL_PAYLOAD = {
+    "symbol": "SOL",
+    "side": "buy",  # Opposite side - should trigger position clearing
+    "entry": "market",
+    "quantity": "1.0",  # Larger than existing position to force clearing + new position
+    "price": "180.00"
+}
+
+def with_timestamp(payload):
+    """Copy of a payload template stamped with the current time at send time"""
+    return {**payload, "timestamp": datetime.now().isoformat()}
+
+# Indicators searched for in the raw webhook response body
+CLEARING_RESPONSE_PATTERN = re.compile(
+    r'clearing all orders and positions|closing position|clear_symbol_orders_and_positions'
+    r'|market_close|position clearing|existing positions',
+    re.IGNORECASE
+)
+MARKET_CLOSE_PATTERN = re.compile(r'market_close', re.IGNORECASE)
+FALLBACK_PATTERN = re.compile(r'fallback|reduce_only|minimal parameter', re.IGNORECASE)
+CLEARING_FAILED_PATTERN = re.compile(r'failed to clear|clearing failed|position clearing failed', re.IGNORECASE)
+
+# Clearing logs seen so far (newest first) so repeat analyses fetch only new ones
+CLEARING_LOG_LIMIT = 50
+_cached_clearing_logs = []
+
+def fetch_clearing_logs():
+    """Return (status_code, newest clearing logs), downloading only entries
+    newer than the ones already cached by a previous call"""
+    # The server filters by keyword; callers still check locally against
+    # backends that ignore the contains/since parameters
+    params = {"limit": CLEARING_LOG_LIMIT, "contains": ",".join(CLEARING_LOG_KEYWORDS)}
+    if _cached_clearing_logs:
+        params["since"] = _cached_clearing_logs[0].get('timestamp')
+    
+    logs_response = get_session().get(f"{BASE_URL}/logs", params=params, timeout=REQUEST_TIMEOUT)
+    if logs_response.status_code != 200:
+        return logs_response.status_code, []
+    
+    new_logs = logs_response.json().get('logs', [])
+    if "since" in params:
+        known_ids = {log.get('id') for log in _cached_clearing_logs}
+        new_logs = [log for log in new_logs if log.get('id') not in known_ids]
+    _cached_clearing_logs[:0] = new_logs
+    del _cached_clearing_logs[CLEARING_LOG_LIMIT:]
+    return 200, list(_cached_clearing_logs)
+
 def test_position_clearing_with_real_scenario():
     """Test position clearing with a real scenario that forces position clearing"""
     print("=" * 80)
@@ -19,20 +90,12 @@ def test_position_clearing_with_real_scenario():
     
     # Step 1: Create a position first (SHORT SOL)
     print("\n--- Step 1: Creating SHORT SOL position ---")
-    short_payload = {
-        "symbol": "SOL",
-        "side": "sell",  # Create short position
-        "entry": "market",
-        "quantity": "0.5",  # Small position for testing
-        "price": "180.00",
-        "timestamp": datetime.now().isoformat()
-    }
     
     webhook_url = f"{BASE_URL}/webhook/tradingview"
     
     try:
         print("📤 Creating SHORT position...")
-        response = requests.post(webhook_url, json=short_payload)
+        response = get_session().post(webhook_url, data=COMPACT_JSON(with_timestamp(SHORT_SOL_PAYLOAD)), headers=JSON_HEADERS, timeout=REQUEST_TIMEOUT)
         print(f"SHORT Position Status Code: {response.status_code}")
         
         if response.status_code == 200:
@@ -73,21 +136,22 @@ def test_position_clearing_with_real_scenario():
         print(f"❌ Error creating SHORT position: {str(e)}")
         return False
     
-    # Wait for position to settle
-    print("\n⏳ Waiting 5 seconds for position to settle...")
-    time.sleep(5)
+    # Wait for position to settle - returns as soon as the short is visible
+    print("\n⏳ Waiting up to 5 seconds for position to settle...")
+    if not wait_for_position(BASE_URL, "SOL", "short"):
+        print("⚠️ SOL short position not visible yet - continuing anyway")
     
     # Step 2: Check current positions
     print("\n--- Step 2: Checking current positions ---")
     try:
-        # Get current logs to see position status
-        logs_response = requests.get(f"{BASE_URL}/logs")
+        # Get current logs to see position status (newest first)
+        logs_response = get_session().get(f"{BASE_URL}/logs", params={"limit": 10}, timeout=REQUEST_TIMEOUT)
         if logs_response.status_code == 200:
             logs_data = logs_response.json()
             logs = logs_data.get('logs', [])
             
             print(f"📊 Checking last 10 logs for position info:")
-            for log in logs[-10:]:
+            for log in logs:
                 message = log.get('message', '').lower()
                 if 'sol' in message and ('position' in message or 'order' in message):
                     print(f"  - {log.get('message', 'No message')}")
@@ -98,65 +162,42 @@ def test_position_clearing_with_real_scenario():
     
     # Step 3: Create opposite position that should trigger clearing
     print("\n--- Step 3: Creating BUY order to trigger position clearing ---")
-    buy_payload = {
-        "symbol": "SOL",
-        "side": "buy",  # Opposite side - should trigger position clearing
-        "entry": "market",
-        "quantity": "1.0",  # Larger than existing position to force clearing + new position
-        "price": "180.00",
-        "timestamp": datetime.now().isoformat()
-    }
     
     try:
         print("📤 Sending BUY order that should trigger position clearing...")
         print("🎯 This should call exchange.market_close() to clear the SHORT position")
         
-        response = requests.post(webhook_url, json=buy_payload)
+        response = get_session().post(webhook_url, data=COMPACT_JSON(with_timestamp(BUY_SOL_PAYLOAD)), headers=JSON_HEADERS, timeout=REQUEST_TIMEOUT)
         print(f"BUY Order Status Code: {response.status_code}")
         
         if response.status_code == 200:
             result = response.json()
             print("✅ BUY order webhook received successfully")
-            print(f"Full Response: {json.dumps(result, indent=2)}")
-            
-            # Analyze the response for position clearing indicators
-            response_str = str(result).lower()
+            if VERBOSE:
+                print(f"Full Response: {json.dumps(result, indent=2)}")
             
-            # Check for position clearing indicators
-            position_clearing_detected = False
-            market_close_used = False
-            fallback_used = False
-            clearing_failed = False
+            # Analyze the raw response body for position clearing indicators
+            response_text = response.text
             
             # Look for position clearing patterns
-            clearing_patterns = [
-                'clearing all orders and positions',
-                'closing position',
-                'clear_symbol_orders_and_positions',
-                'market_close',
-                'position clearing',
-                'existing positions'
-            ]
-            
-            for pattern in clearing_patterns:
-                if pattern in response_str:
-                    position_clearing_detected = True
-                    print(f"✅ Position clearing detected: '{pattern}' found in response")
-                    break
+            clearing_match = CLEARING_RESPONSE_PATTERN.search(response_text)
+            position_clearing_detected = clearing_match is not None
+            if position_clearing_detected:
+                print(f"✅ Position clearing detected: '{clearing_match.group(0).lower()}' found in response")
             
             # Check for market_close usage
-            if 'market_close' in response_str:
-                market_close_used = True
+            market_close_used = MARKET_CLOSE_PATTERN.search(response_text) is not None
+            if market_close_used:
                 print("✅ exchange.market_close() method was used")
             
             # Check for fallback mechanism
-            if any(phrase in response_str for phrase in ['fallback', 'reduce_only', 'minimal parameter']):
-                fallback_used = True
+            fallback_used = FALLBACK_PATTERN.search(response_text) is not None
+            if fallback_used:
                 print("✅ Fallback mechanism was triggered")
             
             # Check for clearing failure
-            if any(phrase in response_str for phrase in ['failed to clear', 'clearing failed', 'position clearing failed']):
-                clearing_failed = True
+            clearing_failed = CLEARING_FAILED_PATTERN.search(response_text) is not None
+            if clearing_failed:
                 print("❌ Position clearing FAILED")
             
             # Check overall success
@@ -197,33 +238,23 @@ def analyze_recent_logs_for_position_clearing():
     print("\n--- Analyzing Recent Logs for Position Clearing Activity ---")
     
     try:
-        logs_response = requests.get(f"{BASE_URL}/logs")
-        if logs_response.status_code == 200:
-            logs_data = logs_response.json()
-            logs = logs_data.get('logs', [])
+        status_code, logs = fetch_clearing_logs()
+        if status_code == 200:
             
             print(f"📊 Analyzing {len(logs)} logs for position clearing activity...")
             
-            # Look for position clearing related logs
-            clearing_logs = []
+            # Look for position clearing related logs, keeping only the 15 shown
+            clearing_logs = deque(maxlen=15)
+            clearing_count = 0
             for log in logs:
-                message = log.get('message', '').lower()
-                if any(keyword in message for keyword in [
-                    'market_close',
-                    'closing position',
-                    'clear_symbol_orders',
-                    'position clearing',
-                    'exchange.market_close',
-                    'fallback',
-                    'reduce_only',
-                    'failed to clear'
-                ]):
+                if CLEARING_LOG_PATTERN.search(log.get('message', '')):
                     clearing_logs.append(log)
+                    clearing_count += 1
             
-            print(f"🔍 Found {len(clearing_logs)} position clearing related logs:")
+            print(f"🔍 Found {clearing_count} position clearing related logs:")
             
             if clearing_logs:
-                for i, log in enumerate(clearing_logs[-15:]):  # Show last 15 relevant logs
+                for i, log in enumerate(clearing_logs):  # Show last 15 relevant logs
                     timestamp = log.get('timestamp', 'No timestamp')
                     level = log.get('level', 'INFO')
                     message = log.get('message', 'No message')
@@ -251,7 +282,7 @@ def analyze_recent_logs_for_position_clearing():
                 print("  - The clearing mechanism is not being triggered")
                 
         else:
-            print(f"❌ Failed to retrieve logs: {logs_response.status_code}")
+            print(f"❌ Failed to retrieve logs: {status_code}")
             
     except Exception as e:
         print(f"❌ Error analyzing logs: {str(e)}")
@@ -1,11 +1,29 @@
 #!/usr/bin/env python3
-import requests
 import json
 from datetime import datetime
+from api_test_utils import REQUEST_TIMEOUT, get_session, COMPACT_JSON, JSON_HEADERS, VERBOSE
 
 # Base URL from frontend/.env
 BASE_URL = "https://strat-manager.preview.emergentagent.com/api"
 
+# Step 1: opens a small SOL short
+CREATE_POSITION_PAYLOAD = {
+    "symbol": "SOL",
+    "side": "sell",  # Create short position
+    "entry": "market",
+    "quantity": "0.1",  # Small amount for testing
+    "price": "175.00"
+}
+
+# Step 2: opposite side and larger size, so the short must be cleared first
+CLEAR_POSITION_PAYLOAD = {
+    "symbol": "SOL",
+    "side": "buy",  # Opposite side to trigger clearing
+    "entry": "market", 
+    "quantity": "0.2",  # Larger than existing position
+    "price": "175.00"
+}
+
 def test_position_clearing_detailed():
     """Detailed test of position clearing mechanism"""
     print("=== DETAILED POSITION CLEARING TEST ===")
@@ -13,22 +31,16 @@ def test_position_clearing_detailed():
     
     # First, let's try to place a small order to create a position
     print("\n--- Step 1: Creating a small position for testing ---")
-    create_position_payload = {
-        "symbol": "SOL",
-        "side": "sell",  # Create short position
-        "entry": "market",
-        "quantity": "0.1",  # Small amount for testing
-        "price": "175.00"
-    }
     
     url = f"{BASE_URL}/webhook/tradingview"
     
     try:
-        response = requests.post(url, json=create_position_payload)
+        response = get_session().post(url, data=COMPACT_JSON(CREATE_POSITION_PAYLOAD), headers=JSON_HEADERS, timeout=REQUEST_TIMEOUT)
         print(f"Create position response: {response.status_code}")
         if response.status_code == 200:
             result = response.json()
-            print(f"Position creation result: {json.dumps(result, indent=2)}")
+            if VERBOSE:
+                print(f"Position creation result: {json.dumps(result, indent=2)}")
         else:
             print(f"Failed to create position: {response.text}")
     except Exception as e:
@@ -36,34 +48,27 @@ def test_position_clearing_detailed():
     
     print("\n--- Step 2: Testing position clearing with opposite order ---")
     # Now try to place opposite order that should trigger position clearing
-    clear_position_payload = {
-        "symbol": "SOL",
-        "side": "buy",  # Opposite side to trigger clearing
-        "entry": "market", 
-        "quantity": "0.2",  # Larger than existing position
-        "price": "175.00"
-    }
-    
     try:
-        response = requests.post(url, json=clear_position_payload)
+        response = get_session().post(url, data=COMPACT_JSON(CLEAR_POSITION_PAYLOAD), headers=JSON_HEADERS, timeout=REQUEST_TIMEOUT)
         print(f"Position clearing test response: {response.status_code}")
         if response.status_code == 200:
             result = response.json()
-            print(f"Position clearing result: {json.dumps(result, indent=2)}")
+            if VERBOSE:
+                print(f"Position clearing result: {json.dumps(result, indent=2)}")
             
-            # Check for specific errors
-            response_str = str(result).lower()
-            if 'market_close' in response_str:
+            # Check for specific errors in the raw body, lowercased once for all checks
+            response_lc = response.content.lower()
+            if b'market_close' in response_lc:
                 print("✅ market_close method is being used")
             else:
                 print("❌ market_close method not detected")
                 
-            if 'order could not immediately match' in response_str:
+            if b'order could not immediately match' in response_lc:
                 print("❌ CRITICAL: 'Order could not immediately match' error still present!")
             else:
                 print("✅ No 'Order could not immediately match' error")
                 
-            if 'failed to clear' in response_str:
+            if b'failed to clear' in response_lc:
                 print("❌ Position clearing is failing")
             else:
                 print("✅ Position clearing appears successful")
@@ -75,10 +80,10 @@ def test_position_clearing_detailed():
     
     print("\n--- Step 3: Checking recent logs for detailed error info ---")
     try:
-        logs_response = requests.get(f"{BASE_URL}/logs")
+        logs_response = get_session().get(f"{BASE_URL}/logs", params={"limit": 20}, timeout=REQUEST_TIMEOUT)
         if logs_response.status_code == 200:
             logs_data = logs_response.json()
-            recent_logs = logs_data.get('logs', [])[:20]
+            recent_logs = logs_data.get('logs', [])
             
             print("Recent logs related to position clearing:")
             for log in recent_logs:
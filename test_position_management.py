@@ -3,9 +3,7 @@
 Test script to demonstrate position management functionality
 """
 
-import requests
-import json
-import time
+from api_test_utils import REQUEST_TIMEOUT, get_session, COMPACT_JSON, JSON_HEADERS, wait_for_position
 
 BASE_URL = "http://localhost:8001"
 
@@ -19,7 +17,7 @@ def send_webhook(symbol, side, quantity, price):
         "price": price
     }
     
-    response = requests.post(f"{BASE_URL}/api/webhook/tradingview", json=payload)
+    response = get_session().post(f"{BASE_URL}/api/webhook/tradingview", data=COMPACT_JSON(payload), headers=JSON_HEADERS, timeout=REQUEST_TIMEOUT)
     return response.json()
 
 def test_position_management():
@@ -36,8 +34,9 @@ def test_position_management():
         print(f"Hyperliquid Status: {hl_response.get('status')}")
         print(f"Message: {hl_response.get('message')}")
     
-    # Wait a bit
-    time.sleep(5)
+    # Wait for the position to open - returns as soon as it is visible
+    if not wait_for_position(f"{BASE_URL}/api", "SOL", "long"):
+        print("Posição SOL long ainda não visível - continuando")
     
     # Test 2: Send opposite signal (should close existing position first)
     print("\n2. Enviando sinal oposto (deve fechar posição existente)...")
@@ -51,7 +50,7 @@ def test_position_management():
     
     # Check logs for position management
     print("\n3. Verificando logs de gerenciamento de posições...")
-    logs_response = requests.get(f"{BASE_URL}/api/logs?limit=20")
+    logs_response = get_session().get(f"{BASE_URL}/api/logs?limit=20", timeout=REQUEST_TIMEOUT)
     if logs_response.status_code == 200:
         logs = logs_response.json().get('logs', [])
         
@@ -1,12 +1,133 @@
 #!/usr/bin/env python3
-import requests
-import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from api_test_utils import REQUEST_TIMEOUT, batch_timeout, get_session, COMPACT_JSON, JSON_HEADERS, RATE_LIMIT_WAITS, hyperliquid_rate_limited
 
 # Base URL from frontend/.env
 BASE_URL = "https://strat-manager.preview.emergentagent.com/api"
 
+def order_statuses(order_response):
+    """response.data.statuses of a Hyperliquid order response, [] if absent"""
+    response = (order_response or {}).get('response') or {}
+    return (response.get('data') or {}).get('statuses', [])
+
+def status_oid(statuses, kinds):
+    """oid of the first status entry of one of the given kinds, e.g. 'filled'"""
+    return next((status[kind].get('oid') for status in statuses for kind in kinds if kind in status), None)
+
+def failed_case(test, error):
+    """Result entry for a scenario whose order could not be checked"""
+    return {
+        'test': test['name'],
+        'main_order': False,
+        'stop_loss': False,
+        'error': error
+    }
+
+def post_stop_loss_case(test):
+    """POST one scenario to the single order webhook"""
+    return get_session().post(f"{BASE_URL}/webhook/tradingview", data=COMPACT_JSON(test['payload']), headers=JSON_HEADERS, timeout=REQUEST_TIMEOUT)
+
+def evaluate_stop_loss_result(test, result, lines):
+    """Check one webhook result's main and stop loss orders; returns its result entry.
+    A scenario Hyperliquid throttled is resent after each of RATE_LIMIT_WAITS
+    before it counts as failed"""
+    for wait in RATE_LIMIT_WAITS:
+        if not hyperliquid_rate_limited(result):
+            break
+        lines.append(f"⚠️ Rate limited by Hyperliquid (429) - resending in {wait}s")
+        time.sleep(wait)
+        try:
+            response = post_stop_loss_case(test)
+        except Exception as e:
+            lines.append(f"❌ Error: {str(e)}")
+            return failed_case(test, str(e))
+        lines.append(f"Status Code: {response.status_code}")
+        if response.status_code != 200:
+            lines.append(f"❌ Webhook failed: {response.status_code}")
+            return failed_case(test, f"HTTP {response.status_code}")
+        result = response.json()
+    
+    hl_response = result.get('hyperliquid_response') or {}
+    
+    if hl_response.get('status') == 'success':
+        order_details = hl_response.get('order_details', {})
+        main_order = order_details.get('hyperliquid_response')
+        stop_loss_response = order_details.get('stop_loss_response')
+        
+        # Check main order
+        main_success = main_order and main_order.get('status') == 'ok'
+        main_oid = status_oid(order_statuses(main_order), ('filled', 'resting')) if main_success else None
+        
+        # Check stop loss
+        stop_success = stop_loss_response and stop_loss_response.get('status') == 'ok'
+        stop_oid = status_oid(order_statuses(stop_loss_response), ('resting',)) if stop_success else None
+        
+        lines.append(f"✅ Main Order: {'SUCCESS' if main_success else 'FAILED'} (ID: {main_oid})")
+        lines.append(f"✅ Stop Loss: {'SUCCESS' if stop_success else 'FAILED'} (ID: {stop_oid})")
+        
+        return {
+            'test': test['name'],
+            'main_order': main_success,
+            'stop_loss': stop_success,
+            'main_oid': main_oid,
+            'stop_oid': stop_oid
+        }
+    
+    error = hl_response.get('message') or hl_response.get('error') or result.get('message')
+    lines.append(f"❌ Order failed: {error}")
+    return failed_case(test, error)
+
+def run_stop_loss_case(test):
+    """Send one stop loss scenario; returns its result entry and report lines"""
+    lines = []
+    
+    try:
+        response = post_stop_loss_case(test)
+        lines.append(f"Status Code: {response.status_code}")
+        
+        if response.status_code == 200:
+            return evaluate_stop_loss_result(test, response.json(), lines), lines
+        else:
+            lines.append(f"❌ Webhook failed: {response.status_code}")
+            return failed_case(test, f"HTTP {response.status_code}"), lines
+            
+    except Exception as e:
+        lines.append(f"❌ Error: {str(e)}")
+        return failed_case(test, str(e)), lines
+
+def run_stop_loss_batch(tests):
+    """Send every scenario in one batch webhook; returns (result entry, report
+    lines) per test in order, or None if the backend has no batch endpoint"""
+    url = f"{BASE_URL}/webhook/tradingview/batch"
+    batch = {"batch": [test['payload'] for test in tests]}
+    
+    try:
+        response = get_session().post(url, data=COMPACT_JSON(batch), headers=JSON_HEADERS, timeout=batch_timeout(len(tests)))
+    except Exception as e:
+        return [(failed_case(test, str(e)), [f"❌ Error: {str(e)}"]) for test in tests]
+    
+    if response.status_code in (404, 405):
+        return None
+    
+    header = [f"Status Code: {response.status_code} (batch of {len(tests)})"]
+    
+    if response.status_code != 200:
+        lines = header + [f"❌ Webhook failed: {response.status_code}"]
+        return [(failed_case(test, f"HTTP {response.status_code}"), list(lines)) for test in tests]
+    
+    responses = response.json().get('responses', [])
+    outcomes = []
+    for i, test in enumerate(tests):
+        lines = list(header)
+        if i < len(responses):
+            outcomes.append((evaluate_stop_loss_result(test, responses[i], lines), lines))
+        else:
+            lines.append("❌ No response returned for this payload")
+            outcomes.append((failed_case(test, "Missing from batch response"), lines))
+    return outcomes
+
 def test_comprehensive_stop_loss():
     """Comprehensive test of stop loss functionality"""
     print("=== COMPREHENSIVE STOP LOSS TESTS ===")
@@ -48,86 +169,20 @@ def test_comprehensive_stop_loss():
         }
     ]
     
-    results = []
-    url = f"{BASE_URL}/webhook/tradingview"
+    # All scenarios go out in one batch webhook and come back in order
+    outcomes = run_stop_loss_batch(tests)
+    if outcomes is None:
+        # Backend without the batch endpoint: the scenarios trade different
+        # symbols, so they are sent concurrently instead
+        print("⚠️ Batch endpoint not available - sending scenarios individually")
+        with ThreadPoolExecutor(max_workers=len(tests)) as executor:
+            outcomes = list(executor.map(run_stop_loss_case, tests))
     
-    for i, test in enumerate(tests):
-        print(f"\n--- Test {i+1}: {test['name']} ---")
-        
-        try:
-            response = requests.post(url, json=test['payload'])
-            print(f"Status Code: {response.status_code}")
-            
-            if response.status_code == 200:
-                result = response.json()
-                hl_response = result.get('hyperliquid_response', {})
-                
-                if hl_response.get('status') == 'success':
-                    order_details = hl_response.get('order_details', {})
-                    main_order = order_details.get('hyperliquid_response')
-                    stop_loss_response = order_details.get('stop_loss_response')
-                    
-                    # Check main order
-                    main_success = main_order and main_order.get('status') == 'ok'
-                    main_oid = None
-                    if main_success:
-                        statuses = main_order.get('response', {}).get('data', {}).get('statuses', [])
-                        for status in statuses:
-                            if 'filled' in status:
-                                main_oid = status['filled'].get('oid')
-                            elif 'resting' in status:
-                                main_oid = status['resting'].get('oid')
-                    
-                    # Check stop loss
-                    stop_success = stop_loss_response and stop_loss_response.get('status') == 'ok'
-                    stop_oid = None
-                    if stop_success:
-                        statuses = stop_loss_response.get('response', {}).get('data', {}).get('statuses', [])
-                        for status in statuses:
-                            if 'resting' in status:
-                                stop_oid = status['resting'].get('oid')
-                    
-                    print(f"✅ Main Order: {'SUCCESS' if main_success else 'FAILED'} (ID: {main_oid})")
-                    print(f"✅ Stop Loss: {'SUCCESS' if stop_success else 'FAILED'} (ID: {stop_oid})")
-                    
-                    results.append({
-                        'test': test['name'],
-                        'main_order': main_success,
-                        'stop_loss': stop_success,
-                        'main_oid': main_oid,
-                        'stop_oid': stop_oid
-                    })
-                    
-                else:
-                    print(f"❌ Order failed: {hl_response.get('message')}")
-                    results.append({
-                        'test': test['name'],
-                        'main_order': False,
-                        'stop_loss': False,
-                        'error': hl_response.get('message')
-                    })
-            else:
-                print(f"❌ Webhook failed: {response.status_code}")
-                results.append({
-                    'test': test['name'],
-                    'main_order': False,
-                    'stop_loss': False,
-                    'error': f"HTTP {response.status_code}"
-                })
-                
-        except Exception as e:
-            print(f"❌ Error: {str(e)}")
-            results.append({
-                'test': test['name'],
-                'main_order': False,
-                'stop_loss': False,
-                'error': str(e)
-            })
-        
-        # Wait between tests to avoid rate limiting
-        if i < len(tests) - 1:
-            print("Waiting 15 seconds to avoid rate limiting...")
-            time.sleep(15)
+    results = []
+    for i, (result, lines) in enumerate(outcomes):
+        print(f"\n--- Test {i+1}: {result['test']} ---")
+        print("\n".join(lines))
+        results.append(result)
     
     # Summary
     print("\n" + "=" * 60)